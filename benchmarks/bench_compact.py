@@ -0,0 +1,51 @@
+"""
+Compares merging and writing a template with the markup Word adds while
+editing (see ``synthetic.paragraph``) as it is and compacted.
+
+    python benchmarks/bench_compact.py [paragraphs] [copies]
+"""
+import sys
+import timeit
+from io import BytesIO
+from os import path
+
+sys.path.insert(0, path.join(path.dirname(__file__), '..'))
+
+from mailmerge import MailMerge  # noqa: E402
+from synthetic import make_docx, field_names  # noqa: E402
+
+
+def main():
+    paragraphs = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    copies = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    template = BytesIO()
+    make_docx(template, paragraphs=paragraphs, fields_per_paragraph=2, table_columns=6, noise=True)
+    template = template.getvalue()
+    records = [dict((name, 'copy %d' % i) for name in field_names()) for i in range(copies)]
+    rows = [dict(('col%d' % c, 'row %d' % r) for c in range(6)) for r in range(copies * 10)]
+
+    print('%10s %10s %16s %10s %10s %10s' % ('', 'open ms', 'templates ms', 'rows ms', 'write ms', 'output KB'))
+    for compact in (False, True):
+        times = dict.fromkeys(('open', 'templates', 'rows', 'write'), float('inf'))
+        for _ in range(3):
+            start = timeit.default_timer()
+            with MailMerge(template, compact=compact) as document:
+                document.get_merge_fields()
+                times['open'] = min(times['open'], timeit.default_timer() - start)
+                start = timeit.default_timer()
+                document.merge_rows('col0', rows)
+                times['rows'] = min(times['rows'], timeit.default_timer() - start)
+                start = timeit.default_timer()
+                document.merge_templates(records, separator='page_break')
+                times['templates'] = min(times['templates'], timeit.default_timer() - start)
+                output = BytesIO()
+                start = timeit.default_timer()
+                document.write(output)
+                times['write'] = min(times['write'], timeit.default_timer() - start)
+        print('%10s %10.1f %16.1f %10.1f %10.1f %10.1f' % (
+            'compact' if compact else 'original', times['open'] * 1000, times['templates'] * 1000,
+            times['rows'] * 1000, times['write'] * 1000, len(output.getvalue()) / 1024.0))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""
+Compares opening a template from file for every document with compiling it
+once and creating documents from the compiled template.
+
+    python benchmarks/bench_compiled_template.py [template.docx] [count]
+"""
+import sys
+import tempfile
+import timeit
+from os import path
+
+sys.path.insert(0, path.join(path.dirname(__file__), '..'))
+
+from mailmerge import MailMerge, CompiledTemplate  # noqa: E402
+
+
+def render(source):
+    with MailMerge(source) as document:
+        document.merge(**dict((field, 'value') for field in document.get_merge_fields()))
+        with tempfile.TemporaryFile() as outfile:
+            document.write(outfile)
+
+
+def main():
+    template_path = sys.argv[1] if len(sys.argv) > 1 else \
+        path.join(path.dirname(__file__), '..', 'tests', 'test_winword2010.docx')
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    from_file = timeit.timeit(lambda: render(template_path), number=count)
+
+    start = timeit.default_timer()
+    template = CompiledTemplate(template_path)
+    compile_time = timeit.default_timer() - start
+    from_template = timeit.timeit(lambda: render(template), number=count)
+
+    print('%d documents from %s' % (count, path.basename(template_path)))
+    print('  MailMerge(path)      %8.2f ms/doc' % (from_file * 1000 / count))
+    print('  MailMerge(template)  %8.2f ms/doc (+ %.2f ms compile once)' % (
+        from_template * 1000 / count, compile_time * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""
+Measures opening, merging and writing a template with six large headers,
+only one of which has merge fields. The headers without fields are copied
+as-is instead of being parsed and serialized.
+
+    python benchmarks/bench_headers.py [header size in KB ...]
+"""
+import sys
+import timeit
+from io import BytesIO
+from os import path
+
+sys.path.insert(0, path.join(path.dirname(__file__), '..'))
+
+from mailmerge import MailMerge  # noqa: E402
+from synthetic import make_docx, field_names  # noqa: E402
+
+REPEAT = 20
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100, 1000]
+    print('%12s %12s' % ('header KB', 'ms/document'))
+    for size in sizes:
+        template = BytesIO()
+        make_docx(template, paragraphs=100, headers=6, header_size=size * 1024, header_fields=2)
+        replacements = dict((name, 'value') for name in field_names() + ['header0', 'header1'])
+
+        def run():
+            with MailMerge(template) as document:
+                document.merge(**replacements)
+                document.write(BytesIO())
+
+        elapsed = min(timeit.repeat(run, number=REPEAT, repeat=3)) / REPEAT
+        print('%12d %12.2f' % (size, elapsed * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+"""
+Measures ``merge_rows`` for a growing number of rows and columns. The time
+per cell should stay about the same across the table.
+
+    python benchmarks/bench_merge_rows.py [rows ...]
+"""
+import sys
+import timeit
+from io import BytesIO
+from os import path
+
+sys.path.insert(0, path.join(path.dirname(__file__), '..'))
+
+from mailmerge import MailMerge  # noqa: E402
+from synthetic import make_docx  # noqa: E402
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 50000]
+    print('%8s %8s %10s %10s' % ('rows', 'columns', 'total ms', 'us/cell'))
+    for columns in (2, 8):
+        template = BytesIO()
+        make_docx(template, paragraphs=1, table_columns=columns)
+        for count in counts:
+            rows = [dict(('col%d' % c, 'row %d col %d' % (r, c)) for c in range(columns)) for r in range(count)]
+            with MailMerge(template) as document:
+                elapsed = timeit.timeit(lambda: document.merge_rows('col0', rows), number=1)
+            print('%8d %8d %10.1f %10.2f' % (count, columns, elapsed * 1000, elapsed * 1e6 / count / columns))
+
+
+if __name__ == '__main__':
+    main()
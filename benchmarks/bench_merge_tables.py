@@ -0,0 +1,38 @@
+"""
+Measures merging rows into a growing number of repeating tables with a single
+``merge`` call. The time per table should stay about the same.
+
+    python benchmarks/bench_merge_tables.py [tables ...]
+"""
+import sys
+import timeit
+from io import BytesIO
+from os import path
+
+sys.path.insert(0, path.join(path.dirname(__file__), '..'))
+
+from mailmerge import MailMerge  # noqa: E402
+from synthetic import make_docx, table_prefix  # noqa: E402
+
+COLUMNS = 4
+ROWS = 10
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [10, 100, 500]
+    print('%8s %10s %10s' % ('tables', 'total ms', 'ms/table'))
+    for count in counts:
+        template = BytesIO()
+        make_docx(template, paragraphs=100, table_columns=COLUMNS, tables=count)
+        replacements = {}
+        for i in range(count):
+            prefix = table_prefix(i)
+            replacements['%s0' % prefix] = [dict(('%s%d' % (prefix, c), 'row %d' % r) for c in range(COLUMNS))
+                                            for r in range(ROWS)]
+        with MailMerge(template) as document:
+            elapsed = timeit.timeit(lambda: document.merge(**replacements), number=1)
+        print('%8d %10.1f %10.3f' % (count, elapsed * 1000, elapsed * 1000 / count))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+"""
+Shows how ``merge_templates`` scales with the number of records and the size
+of the template body. The time per record and paragraph should stay about
+the same across the table.
+
+    python benchmarks/bench_merge_templates.py
+"""
+import sys
+import timeit
+from io import BytesIO
+from os import path
+
+sys.path.insert(0, path.join(path.dirname(__file__), '..'))
+
+from mailmerge import MailMerge  # noqa: E402
+from synthetic import make_docx, field_names  # noqa: E402
+
+
+def main():
+    replacement = dict((name, name.upper()) for name in field_names())
+    print('%8s %10s %10s %14s' % ('records', 'paragraphs', 'total ms', 'us/rec/para'))
+    for paragraphs in (10, 100, 300):
+        template = BytesIO()
+        make_docx(template, paragraphs=paragraphs, fields_per_paragraph=2)
+        for records in (10, 100, 300):
+            with MailMerge(template) as document:
+                elapsed = timeit.timeit(
+                    lambda: document.merge_templates([replacement] * records, 'page_break'), number=1)
+            print('%8d %10d %10.1f %14.2f' % (
+                records, paragraphs, elapsed * 1000, elapsed * 1e6 / records / paragraphs))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+"""
+Measures opening a template with a single paragraph holding many merge
+fields, half of them complex (fldChar/instrText) fields. Opening time should
+grow linearly with the number of fields.
+
+    python benchmarks/bench_open_fields.py [fields ...]
+"""
+import sys
+import timeit
+from io import BytesIO
+from os import path
+
+sys.path.insert(0, path.join(path.dirname(__file__), '..'))
+
+from mailmerge import MailMerge  # noqa: E402
+from synthetic import make_docx  # noqa: E402
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [250, 500, 1000, 2000, 4000]
+    print('%8s %10s %12s' % ('fields', 'open ms', 'us/field'))
+    for count in counts:
+        template = BytesIO()
+        make_docx(template, paragraphs=1, fields_per_paragraph=count, field_count=count)
+        elapsed = min(timeit.repeat(lambda: MailMerge(template).close(), number=1, repeat=3))
+        print('%8d %10.1f %12.2f' % (count, elapsed * 1000, elapsed * 1e6 / count))
+
+
+if __name__ == '__main__':
+    main()
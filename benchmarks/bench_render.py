@@ -0,0 +1,44 @@
+"""
+Compares documents per second of merging a compiled template the regular way
+with ``CompiledTemplate.render``.
+
+    python benchmarks/bench_render.py [paragraphs] [count]
+"""
+import sys
+import timeit
+from io import BytesIO
+from os import path
+
+sys.path.insert(0, path.join(path.dirname(__file__), '..'))
+
+from mailmerge import MailMerge, CompiledTemplate  # noqa: E402
+from synthetic import make_docx, field_names  # noqa: E402
+
+
+def merge(template, record):
+    with MailMerge(template) as document:
+        document.merge(**record)
+        document.write(BytesIO())
+
+
+def main():
+    paragraphs = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    docx = BytesIO()
+    make_docx(docx, paragraphs=paragraphs, fields_per_paragraph=2, field_count=20)
+    docx.seek(0)
+    template = CompiledTemplate(docx)
+    record = dict((name, 'Value of %s\nsecond line' % name) for name in field_names(20))
+    template.render(BytesIO(), **record)
+
+    tree = timeit.timeit(lambda: merge(template, record), number=count)
+    fast = timeit.timeit(lambda: template.render(BytesIO(), **record), number=count)
+
+    print('%d paragraphs, %d fields' % (paragraphs, paragraphs * 2))
+    print('  MailMerge(template)   %8.1f docs/s' % (count / tree))
+    print('  template.render()     %8.1f docs/s' % (count / fast))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Compares rendering every record with rendering through a RenderCache, on a
+second run over the same records in which a few of them changed.
+
+    python benchmarks/bench_render_cache.py [records] [changed percentage]
+"""
+import shutil
+import sys
+import tempfile
+import timeit
+from io import BytesIO
+from os import path
+
+sys.path.insert(0, path.join(path.dirname(__file__), '..'))
+
+from mailmerge import CompiledTemplate, RenderCache  # noqa: E402
+from synthetic import make_docx, field_names  # noqa: E402
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    changed = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    directory = tempfile.mkdtemp()
+    try:
+        filename = path.join(directory, 'template.docx')
+        make_docx(filename, paragraphs=1000, fields_per_paragraph=2)
+        template = CompiledTemplate(filename)
+        names = field_names(10)
+        records = [dict((name, '%s %d' % (name, i)) for name in names) for i in range(count)]
+        cache = RenderCache(path.join(directory, 'cache'))
+        for record in records:
+            cache.get(template, **record)
+
+        for i in range(0, count, 100 // changed):
+            records[i] = dict(records[i], **{names[0]: 'changed'})
+
+        def render():
+            for record in records:
+                template.render(BytesIO(), **record)
+
+        def cached():
+            for record in records:
+                cache.render(template, BytesIO(), **record)
+
+        print('%10s %12s' % ('', 'ms/record'))
+        for name, run in (('render', render), ('cache', cached)):
+            elapsed = timeit.timeit(run, number=1)
+            print('%10s %12.2f' % (name, elapsed * 1000 / count))
+        print('hits %d, misses %d, %.1f MB' % (cache.hits, cache.misses - count, cache.size / 1e6))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""
+Measures throughput of ``MailMerge.render_many`` for a growing number of
+worker processes.
+
+    python benchmarks/bench_render_many.py [records] [workers ...]
+"""
+import multiprocessing
+import sys
+import timeit
+from io import BytesIO
+from os import path
+
+sys.path.insert(0, path.join(path.dirname(__file__), '..'))
+
+from mailmerge import MailMerge, CompiledTemplate  # noqa: E402
+from synthetic import make_docx, field_names  # noqa: E402
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    workers = [int(arg) for arg in sys.argv[2:]] or \
+        sorted(set([1, 2, 4, multiprocessing.cpu_count()]))
+
+    docx = BytesIO()
+    make_docx(docx, paragraphs=200, fields_per_paragraph=2, field_count=20)
+    docx.seek(0)
+    template = CompiledTemplate(docx)
+    records = [dict((name, '%s %d' % (name, i)) for name in field_names(20)) for i in range(count)]
+
+    print('%d records, %d cores' % (count, multiprocessing.cpu_count()))
+    for n in workers:
+        elapsed = timeit.timeit(lambda: list(MailMerge.render_many(template, records, workers=n)), number=1)
+        print('  workers=%-3d %8.1f docs/s' % (n, count / elapsed))
+
+
+if __name__ == '__main__':
+    main()
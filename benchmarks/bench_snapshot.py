@@ -0,0 +1,47 @@
+"""
+Compares rendering variants of a document by opening the template for every
+variant with restoring a snapshot of it.
+
+    python benchmarks/bench_snapshot.py [paragraphs] [variants]
+"""
+import sys
+import timeit
+from io import BytesIO
+from os import path
+
+sys.path.insert(0, path.join(path.dirname(__file__), '..'))
+
+from mailmerge import MailMerge  # noqa: E402
+from synthetic import make_docx, field_names  # noqa: E402
+
+
+def main():
+    paragraphs = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    variants = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    template = BytesIO()
+    make_docx(template, paragraphs=paragraphs, fields_per_paragraph=2)
+    template = template.getvalue()
+    records = [dict((name, 'variant %d' % i) for name in field_names()) for i in range(variants)]
+
+    def reopen():
+        for record in records:
+            with MailMerge(template) as document:
+                document.merge(**record)
+                document.write(BytesIO())
+
+    def restore():
+        with MailMerge(template) as document:
+            snapshot = document.snapshot()
+            for record in records:
+                document.restore(snapshot)
+                document.merge(**record)
+                document.write(BytesIO())
+
+    print('%10s %10s' % ('', 'ms/variant'))
+    for name, run in (('reopen', reopen), ('restore', restore)):
+        elapsed = min(timeit.repeat(run, number=1, repeat=3))
+        print('%10s %10.1f' % (name, elapsed * 1000 / variants))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Compares opening a template file for every request with opening it from a
+TemplateCache, with a few templates used in turn.
+
+    python benchmarks/bench_template_cache.py [templates] [requests]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+from os import path
+
+sys.path.insert(0, path.join(path.dirname(__file__), '..'))
+
+from mailmerge import MailMerge, TemplateCache  # noqa: E402
+from synthetic import make_docx  # noqa: E402
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    directory = tempfile.mkdtemp()
+    try:
+        files = []
+        for i in range(count):
+            files.append(os.path.join(directory, 'template%d.docx' % i))
+            make_docx(files[-1], paragraphs=500 + i, fields_per_paragraph=2)
+        cache = TemplateCache()
+
+        def run(open_document):
+            for i in range(requests):
+                with open_document(files[i % count]) as document:
+                    document.merge(field0='value')
+
+        print('%10s %12s' % ('', 'ms/request'))
+        for name, open_document in (('open', MailMerge), ('cache', cache.open)):
+            elapsed = timeit.timeit(lambda: run(open_document), number=1)
+            print('%10s %12.2f' % (name, elapsed * 1000 / requests))
+        print('hits %d, misses %d, evictions %d, %.1f MB' % (
+            cache.hits, cache.misses, cache.evictions, cache.size / 1e6))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Measures ``write()`` on a template with large media members, compared with
+decompressing and compressing every member again, and writing documents
+made from a ``CompiledTemplate``, which shares its compressed members.
+
+    python benchmarks/bench_write_media.py [media_files] [media_size]
+"""
+import sys
+import timeit
+from io import BytesIO
+from os import path
+from zipfile import ZipFile, ZIP_DEFLATED
+
+sys.path.insert(0, path.join(path.dirname(__file__), '..'))
+
+from mailmerge import MailMerge, CompiledTemplate  # noqa: E402
+from synthetic import make_docx  # noqa: E402
+
+
+def recompress(document, outfile):
+    with ZipFile(outfile, 'w', ZIP_DEFLATED) as output:
+        for zi in document.zip.filelist:
+            output.writestr(zi.filename, document.zip.read(zi))
+
+
+def main():
+    media_files = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    media_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1024 * 1024
+    count = 10
+
+    template = BytesIO()
+    make_docx(template, paragraphs=50, media_files=media_files, media_size=media_size)
+
+    with MailMerge(template) as document:
+        raw = timeit.timeit(lambda: document.write(BytesIO()), number=count)
+        old = timeit.timeit(lambda: recompress(document, BytesIO()), number=count)
+
+    template.seek(0)
+    template = CompiledTemplate(template)
+    with MailMerge(template) as document:
+        cached = timeit.timeit(lambda: document.write(BytesIO()), number=count)
+
+    print('%d media members of %d KiB' % (media_files, media_size // 1024))
+    print('  write() with raw copy   %8.2f ms' % (raw * 1000 / count))
+    print('  recompress all members  %8.2f ms' % (old * 1000 / count))
+    print('  write() from template   %8.2f ms' % (cached * 1000 / count))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Compares the peak memory and time of ``merge`` followed by ``write`` with
+``write_merged`` for large documents with only a few fields. Every run is done
+in a new process, so its peak memory can be measured.
+
+    python benchmarks/bench_write_merged.py [paragraphs ...]
+"""
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO
+from os import path
+
+sys.path.insert(0, path.join(path.dirname(__file__), '..'))
+
+from mailmerge import MailMerge  # noqa: E402
+from synthetic import make_docx  # noqa: E402
+
+COLUMNS = 5
+
+
+def run(mode, template):
+    replacements = dict(('col%d' % i, 'value') for i in range(COLUMNS))
+    start = time.time()
+    with MailMerge(template) as document:
+        if mode == 'stream':
+            document.write_merged(BytesIO(), **replacements)
+        else:
+            document.merge(**replacements)
+            document.write(BytesIO())
+    elapsed = time.time() - start
+    # ru_maxrss is in KB on Linux
+    print('%.3f %d' % (elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+
+
+def make(count, template):
+    # static text, with a few fields in a table at the end
+    make_docx(template, paragraphs=count, fields_per_paragraph=0, table_columns=COLUMNS)
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [10000, 100000]
+    print('%10s %10s %8s %10s %8s' % ('paragraphs', 'tree s', 'tree MB', 'stream s', 'stream MB'))
+    directory = tempfile.mkdtemp()
+    try:
+        for count in counts:
+            # the peak memory of a process includes that of its parent at the
+            # time it was started, so the parent stays small
+            template = path.join(directory, 'template-%d.docx' % count)
+            subprocess.check_call([sys.executable, __file__, '--make', str(count), template])
+            results = []
+            for mode in ('tree', 'stream'):
+                output = subprocess.check_output([sys.executable, __file__, '--run', mode, template])
+                elapsed, maxrss = output.split()
+                results.extend([float(elapsed), int(maxrss) / 1024.0])
+            print('%10d %10.2f %8.0f %10.2f %8.0f' % ((count,) + tuple(results)))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--run']:
+        run(sys.argv[2], sys.argv[3])
+    elif sys.argv[1:2] == ['--make']:
+        make(int(sys.argv[2]), sys.argv[3])
+    else:
+        main()
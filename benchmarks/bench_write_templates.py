@@ -0,0 +1,59 @@
+"""
+Compares peak memory of ``merge_templates`` + ``write`` with
+``write_templates`` for a growing number of records. Every measurement runs
+in a fresh process, as lxml allocates outside of the Python heap.
+
+    python benchmarks/bench_write_templates.py [records ...]
+"""
+import multiprocessing
+import resource
+import sys
+import timeit
+from io import BytesIO
+from os import path
+
+sys.path.insert(0, path.join(path.dirname(__file__), '..'))
+
+from mailmerge import MailMerge  # noqa: E402
+from synthetic import make_docx, field_names  # noqa: E402
+
+
+def records(count):
+    for i in range(count):
+        yield dict((name, '%s %d' % (name, i)) for name in field_names())
+
+
+def run(method, count, queue):
+    template = BytesIO()
+    make_docx(template, paragraphs=30)
+    start = timeit.default_timer()
+    with MailMerge(template) as document:
+        if method == 'merge_templates':
+            document.merge_templates(list(records(count)), 'page_break')
+            document.write(BytesIO())
+        else:
+            document.write_templates(BytesIO(), records(count), 'page_break')
+    elapsed = timeit.default_timer() - start
+    queue.put((elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+
+
+def measure(method, count):
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=run, args=(method, count, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [100, 1000, 5000]
+    print('%8s %24s %24s' % ('records', 'merge_templates + write', 'write_templates'))
+    for count in counts:
+        merged = measure('merge_templates', count)
+        streamed = measure('write_templates', count)
+        print('%8d %10.2f s %8d KiB %10.2f s %8d KiB' % ((count,) + merged + streamed))
+
+
+if __name__ == '__main__':
+    main()
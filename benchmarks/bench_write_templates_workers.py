@@ -0,0 +1,39 @@
+"""
+Measures ``write_templates`` with a growing number of worker processes.
+
+    python benchmarks/bench_write_templates_workers.py [records] [workers ...]
+"""
+import multiprocessing
+import sys
+import timeit
+from io import BytesIO
+from os import path
+
+sys.path.insert(0, path.join(path.dirname(__file__), '..'))
+
+from mailmerge import MailMerge  # noqa: E402
+from synthetic import make_docx, field_names  # noqa: E402
+
+
+def records(count):
+    for i in range(count):
+        yield dict((name, '%s %d' % (name, i)) for name in field_names())
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    workers = [int(arg) for arg in sys.argv[2:]] or sorted(set([1, 2, 4, multiprocessing.cpu_count()]))
+
+    template = BytesIO()
+    make_docx(template, paragraphs=30)
+    print('%d records, %d cores' % (count, multiprocessing.cpu_count()))
+    print('%8s %10s %12s' % ('workers', 'seconds', 'records/s'))
+    with MailMerge(template) as document:
+        for n in workers:
+            elapsed = timeit.timeit(
+                lambda: document.write_templates(BytesIO(), records(count), 'page_break', workers=n), number=1)
+            print('%8d %10.2f %12.0f' % (n, elapsed, count / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""
+Measures ``write`` with a growing number of threads, for a document with a
+large body and a large header with fields.
+
+    python benchmarks/bench_write_threads.py [paragraphs] [threads ...]
+"""
+import multiprocessing
+import sys
+import timeit
+from io import BytesIO
+from os import path
+
+sys.path.insert(0, path.join(path.dirname(__file__), '..'))
+
+from mailmerge import MailMerge  # noqa: E402
+from synthetic import make_docx, field_names  # noqa: E402
+
+
+def main():
+    paragraphs = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    counts = [int(arg) for arg in sys.argv[2:]] or sorted(set([1, 2, 4, multiprocessing.cpu_count()]))
+
+    template = BytesIO()
+    make_docx(template, paragraphs=paragraphs, fields_per_paragraph=2, headers=2, header_size=4 << 20,
+              header_fields=2)
+    print('%d paragraphs, %d cores' % (paragraphs, multiprocessing.cpu_count()))
+    print('%8s %10s' % ('threads', 'write ms'))
+    with MailMerge(template) as document:
+        document.merge(**dict((name, 'value') for name in field_names()))
+        for threads in counts:
+            elapsed = min(timeit.repeat(lambda: document.write(BytesIO(), threads=threads), number=1, repeat=3))
+            print('%8d %10.1f' % (threads, elapsed * 1000))
+
+
+if __name__ == '__main__':
+    main()
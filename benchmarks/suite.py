@@ -0,0 +1,200 @@
+"""
+Times the main operations of MailMerge on synthetic templates of various
+shapes (see ``SCENARIOS`` and ``synthetic.make_docx``) and records their peak
+memory. Every operation runs in a new process, so its peak memory can be
+measured; it includes opening the template.
+
+    python benchmarks/suite.py [-o results.json] [-s scenario ...] [-r repeat]
+
+The results are written as JSON, so two revisions can be compared:
+
+    python benchmarks/suite.py -o before.json
+    git checkout other-revision
+    python benchmarks/suite.py -o after.json
+    python benchmarks/suite.py --compare before.json after.json
+"""
+import argparse
+import json
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO
+from os import path
+
+sys.path.insert(0, path.join(path.dirname(__file__), '..'))
+
+from lxml import etree  # noqa: E402
+from mailmerge import MailMerge  # noqa: E402
+from synthetic import make_docx, field_names  # noqa: E402
+
+SCENARIOS = {
+    'small': dict(paragraphs=100),
+    'large': dict(paragraphs=5000),
+    'many_fields': dict(paragraphs=1000, fields_per_paragraph=4, field_count=200),
+    'table': dict(paragraphs=100, table_columns=6),
+    'media': dict(paragraphs=100, media_files=20, media_size=1 << 19),
+}
+
+SEPARATORS = ('page_break', 'column_break', 'textWrapping_break', 'continuous_section', 'evenPage_section',
+              'nextColumn_section', 'nextPage_section', 'oddPage_section')
+
+# the number of rows for merge_rows and of copies for merge_templates
+ROWS = 1000
+COPIES = 20
+
+
+def operations(scenario):
+    ops = ['open', 'get_merge_fields', 'merge', 'write']
+    if SCENARIOS[scenario].get('table_columns'):
+        ops.append('merge_rows')
+    ops.extend('merge_templates:%s' % separator for separator in SEPARATORS)
+    return ops
+
+
+def record(params, i=0):
+    return dict((name, '%s %d' % (name, i)) for name in field_names(params.get('field_count', 10)))
+
+
+def rows(params):
+    return [dict(('col%d' % c, 'row %d' % r) for c in range(params['table_columns'])) for r in range(ROWS)]
+
+
+def run_once(operation, params, template):
+    # Returns the time operation takes on a newly opened template
+    if operation == 'open':
+        start = time.time()
+        MailMerge(template).close()
+        return time.time() - start
+
+    with MailMerge(template) as document:
+        if operation == 'get_merge_fields':
+            # the fields of parts that are parsed on first use count too
+            start = time.time()
+            document.get_merge_fields()
+        elif operation == 'merge':
+            start = time.time()
+            document.merge(**record(params))
+        elif operation == 'merge_rows':
+            replacements = rows(params)
+            start = time.time()
+            document.merge_rows('col0', replacements)
+        elif operation == 'write':
+            document.merge(**record(params))
+            output = BytesIO()
+            start = time.time()
+            document.write(output)
+        elif operation.startswith('merge_templates:'):
+            replacements = [record(params, i) for i in range(COPIES)]
+            start = time.time()
+            document.merge_templates(replacements, separator=operation.split(':', 1)[1])
+        else:
+            raise ValueError('unknown operation %r' % operation)
+        return time.time() - start
+
+
+def run(scenario, operation, template, repeat):
+    times = [run_once(operation, SCENARIOS[scenario], template) for _ in range(repeat)]
+    # ru_maxrss is in KB on Linux, but in bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        maxrss //= 1024
+    json.dump({'times': times, 'peak_kb': maxrss}, sys.stdout)
+
+
+def revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=path.dirname(__file__),
+                                       stderr=subprocess.STDOUT).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(args):
+    results = []
+    directory = tempfile.mkdtemp()
+    try:
+        for scenario in args.scenario or sorted(SCENARIOS):
+            # the peak memory of a process includes that of its parent at the
+            # time it was started, so the parent stays small
+            template = path.join(directory, '%s.docx' % scenario)
+            subprocess.check_call([sys.executable, __file__, '--make', scenario, template])
+            for operation in operations(scenario):
+                output = subprocess.check_output([sys.executable, __file__, '--run', scenario, operation, template,
+                                                  str(args.repeat)])
+                result = json.loads(output.decode('utf-8'))
+                results.append({
+                    'scenario': scenario,
+                    'operation': operation,
+                    'best': min(result['times']),
+                    'mean': sum(result['times']) / len(result['times']),
+                    'peak_mb': result['peak_kb'] / 1024.0,
+                })
+                print('%-12s %-36s %10.2f ms %8.1f MB' % (
+                    scenario, operation, results[-1]['best'] * 1000, results[-1]['peak_mb']))
+    finally:
+        shutil.rmtree(directory)
+
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump({
+                'revision': revision(),
+                'python': platform.python_version(),
+                'lxml': etree.__version__,
+                'platform': platform.platform(),
+                'repeat': args.repeat,
+                'scenarios': SCENARIOS,
+                'results': results,
+            }, fp, indent=2, sort_keys=True)
+
+
+def compare(before, after, threshold):
+    with open(before) as fp:
+        before = json.load(fp)
+    with open(after) as fp:
+        after = json.load(fp)
+
+    old = dict(((r['scenario'], r['operation']), r) for r in before['results'])
+    print('%s -> %s' % (before.get('revision'), after.get('revision')))
+    print('%-12s %-36s %10s %10s %7s %9s %9s' % (
+        'scenario', 'operation', 'before ms', 'after ms', 'time', 'before MB', 'after MB'))
+    regressions = 0
+    for result in after['results']:
+        previous = old.get((result['scenario'], result['operation']))
+        if previous is None:
+            continue
+        ratio = result['best'] / previous['best'] if previous['best'] else 1.0
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = ' slower'
+            regressions += 1
+        elif ratio < 1 - threshold:
+            flag = ' faster'
+        print('%-12s %-36s %10.2f %10.2f %6.2fx %9.1f %9.1f%s' % (
+            result['scenario'], result['operation'], previous['best'] * 1000, result['best'] * 1000, ratio,
+            previous['peak_mb'], result['peak_mb'], flag))
+    return regressions
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--run']:
+        run(sys.argv[2], sys.argv[3], sys.argv[4], int(sys.argv[5]))
+    elif sys.argv[1:2] == ['--make']:
+        make_docx(sys.argv[3], **SCENARIOS[sys.argv[2]])
+    else:
+        parser = argparse.ArgumentParser(description='Benchmarks the main operations of MailMerge.')
+        parser.add_argument('-o', '--output', help='write the results to this JSON file')
+        parser.add_argument('-s', '--scenario', action='append', choices=sorted(SCENARIOS),
+                            help='only run this scenario, can be given more than once')
+        parser.add_argument('-r', '--repeat', type=int, default=3, help='runs per operation (default: 3)')
+        parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'),
+                            help='compare two JSON files written with --output')
+        parser.add_argument('--threshold', type=float, default=0.1,
+                            help='relative change in time reported by --compare (default: 0.1)')
+        args = parser.parse_args()
+        if args.compare:
+            sys.exit(1 if compare(args.compare[0], args.compare[1], args.threshold) else 0)
+        main(args)
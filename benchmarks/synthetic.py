@@ -0,0 +1,185 @@
+"""
+Generates synthetic .docx templates for the benchmarks.
+"""
+import os
+import random
+from zipfile import ZipFile, ZIP_DEFLATED
+
+W = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+R = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+
+CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Default Extension="bin" ContentType="application/octet-stream"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '<Override PartName="/word/settings.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.settings+xml"/>'
+    '%s</Types>')
+
+HEADER_TYPE = (
+    '<Override PartName="/word/header%d.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.header+xml"/>')
+
+RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="word/document.xml"/>'
+    '</Relationships>')
+
+SETTINGS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<w:settings xmlns:w="%s"><w:zoom w:percent="100"/>'
+    '<w:mailMerge><w:mainDocumentType w:val="formLetters"/></w:mailMerge>'
+    '</w:settings>' % W)
+
+
+def simple_field(name):
+    return ('<w:fldSimple w:instr=" MERGEFIELD %s \\* MERGEFORMAT ">'
+            '<w:r><w:t>[%s]</w:t></w:r></w:fldSimple>' % (name, name))
+
+
+def complex_field(name):
+    return ('<w:r><w:fldChar w:fldCharType="begin"/></w:r>'
+            '<w:r><w:instrText xml:space="preserve"> MERGEFIELD </w:instrText></w:r>'
+            '<w:r><w:instrText xml:space="preserve">%s \\* MERGEFORMAT </w:instrText></w:r>'
+            '<w:r><w:fldChar w:fldCharType="separate"/></w:r>'
+            '<w:r><w:t>[%s]</w:t></w:r>'
+            '<w:r><w:fldChar w:fldCharType="end"/></w:r>' % (name, name))
+
+
+def paragraph(fields, noise=False):
+    """
+    A paragraph with some static text and the fields. With noise, it has the
+    markup Word adds while editing: revision ids, proofing marks and text
+    split over runs with the same formatting.
+    """
+    if not noise:
+        runs = ['<w:r><w:rPr><w:b/></w:rPr><w:t xml:space="preserve">Some static text </w:t></w:r>']
+        for i, name in enumerate(fields):
+            runs.append(complex_field(name) if i % 2 else simple_field(name))
+            runs.append('<w:r><w:t xml:space="preserve"> and </w:t></w:r>')
+        return '<w:p>%s</w:p>' % ''.join(runs)
+
+    runs = ['<w:r w:rsidR="00A1B2C3" w:rsidRPr="00D4E5F6"><w:rPr><w:b/></w:rPr><w:lastRenderedPageBreak/>'
+            '<w:t xml:space="preserve">Some </w:t></w:r>'
+            '<w:proofErr w:type="spellStart"/>'
+            '<w:r w:rsidR="00A1B2C3" w:rsidRPr="00D4E5F6"><w:rPr><w:b/></w:rPr><w:t>static</w:t></w:r>'
+            '<w:proofErr w:type="spellEnd"/>'
+            '<w:r w:rsidR="00F7A8B9" w:rsidRPr="00D4E5F6"><w:rPr><w:b/></w:rPr>'
+            '<w:t xml:space="preserve"> text </w:t></w:r>']
+    for i, name in enumerate(fields):
+        runs.append(complex_field(name) if i % 2 else simple_field(name))
+        runs.append('<w:r w:rsidR="00A1B2C3"><w:t xml:space="preserve"> and</w:t></w:r>'
+                    '<w:r w:rsidR="00F7A8B9"><w:t xml:space="preserve"> </w:t></w:r>')
+    return '<w:p w:rsidR="00A1B2C3" w:rsidRDefault="00F7A8B9" w:rsidP="00D4E5F6">%s</w:p>' % ''.join(runs)
+
+
+def header_xml(size, fields=0):
+    """
+    A header of about ``size`` bytes, most of it a VML shape like the ones
+    logos are drawn with, with ``fields`` merge fields named ``header0`` up
+    to ``header<fields - 1>``.
+    """
+    rnd = random.Random(size)
+    points = []
+    length = 0
+    while length < size:
+        point = '%d,%d' % (rnd.randint(0, 99999), rnd.randint(0, 99999))
+        points.append(point)
+        length += len(point) + 1
+    shape = ('<w:r><w:pict><v:shape xmlns:v="urn:schemas-microsoft-com:vml" style="width:100pt;height:50pt" '
+             'path="m %s x e"/></w:pict></w:r>' % ' l '.join(points))
+    return ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<w:hdr xmlns:w="%s">%s%s</w:hdr>'
+            % (W, paragraph(['header%d' % i for i in range(fields)]), '<w:p>%s</w:p>' % shape))
+
+
+def table(columns, prefix='col'):
+    """
+    A table with a header row and a template row with the fields ``col0`` up
+    to ``col<columns - 1>``, or another ``prefix`` than ``col``.
+    """
+    header = ''.join('<w:tc><w:p><w:r><w:t>Column %d</w:t></w:r></w:p></w:tc>' % i for i in range(columns))
+    row = ''.join('<w:tc><w:p>%s</w:p></w:tc>' % complex_field('%s%d' % (prefix, i)) for i in range(columns))
+    return '<w:tbl><w:tblPr/><w:tr>%s</w:tr><w:tr>%s</w:tr></w:tbl>' % (header, row)
+
+
+def table_prefix(index):
+    """
+    The field prefix of the table at ``index``: ``col`` for the first table,
+    ``table<index>_col`` for the others.
+    """
+    return 'table%d_col' % index if index else 'col'
+
+
+def document_xml(paragraphs, fields_per_paragraph, field_count, table_columns=0, tables=1, noise=False):
+    body = []
+    n = 0
+    for _ in range(paragraphs):
+        names = []
+        for _ in range(fields_per_paragraph):
+            names.append('field%d' % (n % field_count))
+            n += 1
+        body.append(paragraph(names, noise))
+    if table_columns:
+        for i in range(tables):
+            body.append(paragraph([]))
+            body.append(table(table_columns, table_prefix(i)))
+    return ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<w:document xmlns:w="%s" xmlns:r="%s"><w:body>%s'
+            '<w:sectPr><w:pgSz w:w="11906" w:h="16838"/></w:sectPr>'
+            '</w:body></w:document>' % (W, R, ''.join(body)))
+
+
+def media(size, seed=0):
+    """
+    Returns ``size`` bytes that compress roughly like images and fonts do,
+    part random and part repetitive.
+    """
+    rnd = random.Random(seed)
+    chunk = bytes(bytearray(rnd.getrandbits(8) for _ in range(1024)))
+    data = bytearray()
+    while len(data) < size:
+        data += chunk[:rnd.randint(16, 1024)]
+        data += bytes(bytearray([rnd.getrandbits(8)])) * rnd.randint(16, 512)
+    return bytes(data[:size])
+
+
+def make_docx(file, paragraphs=100, fields_per_paragraph=1, field_count=10, media_files=0, media_size=0,
+              table_columns=0, tables=1, headers=0, header_size=0, header_fields=0, noise=False):
+    """
+    Writes a template with ``paragraphs`` paragraphs that each contain
+    ``fields_per_paragraph`` merge fields, named ``field0`` up to
+    ``field<field_count - 1>``, and ``media_files`` binary members of
+    ``media_size`` bytes each. With ``table_columns``, the body ends with
+    ``tables`` tables for ``merge_rows``, see ``table`` and ``table_prefix``.
+    There are ``headers`` headers of ``header_size`` bytes, the first of which
+    has ``header_fields`` merge fields, see ``header_xml``. With ``noise``,
+    the paragraphs have the markup of a template edited in Word, see
+    ``paragraph``.
+    """
+    with ZipFile(file, 'w', ZIP_DEFLATED) as docx:
+        docx.writestr('[Content_Types].xml', CONTENT_TYPES % ''.join(HEADER_TYPE % (i + 1) for i in range(headers)))
+        docx.writestr('_rels/.rels', RELS)
+        docx.writestr('word/document.xml', document_xml(paragraphs, fields_per_paragraph, field_count, table_columns,
+                                                        tables, noise))
+        docx.writestr('word/settings.xml', SETTINGS)
+        for i in range(headers):
+            docx.writestr('word/header%d.xml' % (i + 1), header_xml(header_size, header_fields if i == 0 else 0))
+        for i in range(media_files):
+            docx.writestr('word/media/image%d.bin' % i, media(media_size, seed=i))
+
+
+def field_names(field_count=10):
+    return ['field%d' % i for i in range(field_count)]
+
+
+if __name__ == '__main__':
+    import sys
+    make_docx(sys.argv[1] if len(sys.argv) > 1 else os.devnull)
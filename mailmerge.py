@@ -1,9 +1,35 @@
+from collections import OrderedDict, deque
 from copy import deepcopy
+from io import BytesIO, RawIOBase
+import hashlib
+import json
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+import os
+import shutil
+import tempfile
+import threading
+from timeit import default_timer as _clock
 import warnings
 from lxml.etree import Element
 from lxml import etree
-from zipfile import ZipFile, ZIP_DEFLATED
+from zipfile import ZipFile, ZipInfo, ZIP_DEFLATED, ZIP_STORED
+import zipfile
+import re
 import shlex
+import struct
+import uuid
+import zlib
+
+try:
+    from collections.abc import MutableMapping
+except ImportError:  # Python 2
+    from collections import MutableMapping
+
+try:
+    import queue
+except ImportError:  # Python 2
+    import Queue as queue
 
 
 NAMESPACES = {
@@ -20,134 +46,890 @@ CONTENT_TYPES_PARTS = (
 
 CONTENT_TYPE_SETTINGS = 'application/vnd.openxmlformats-officedocument.wordprocessingml.settings+xml'
 
+# Rough number of bytes a parsed part takes in memory per byte of XML, see
+# CompiledTemplate.size
+TREE_SIZE_FACTOR = 12
+
+# Elements that are streamed by MailMerge.write_merged rather than built as a
+# whole, when they are the root or inside one another
+STREAM_CONTAINERS = frozenset('{%s}%s' % (NAMESPACES['w'], tag) for tag in (
+    'document', 'body', 'hdr', 'ftr', 'tbl', 'tr', 'tc', 'sdt', 'sdtContent', 'customXml'))
+
+
+# The ZipFile internals _write_raw relies on
+RAW_WRITE_ATTRIBUTES = ('_lock', '_writing', '_writecheck', '_didModify', '_seekable', 'start_dir')
+
+
+def _raw_offset(zip, zi):
+    """
+    Returns the offset of the compressed bytes of the member ``zi`` of ``zip``.
+    """
+    fp = zip.fp
+    fp.seek(zi.header_offset)
+    header = struct.unpack(zipfile.structFileHeader, fp.read(zipfile.sizeFileHeader))
+    # skip the file name and extra field of the local file header
+    return zi.header_offset + zipfile.sizeFileHeader + \
+        header[zipfile._FH_FILENAME_LENGTH] + header[zipfile._FH_EXTRA_FIELD_LENGTH]
+
+
+def _read_raw(zip, zi):
+    """
+    Returns the compressed bytes of the member ``zi`` of ``zip``.
+    """
+    zip.fp.seek(_raw_offset(zip, zi))
+    return zip.fp.read(zi.compress_size)
+
+
+def _write_raw(output, zi, data):
+    """
+    Adds a member to ``output`` from its compressed bytes, so it doesn't have
+    to be decompressed and compressed again. ``zi`` describes the member as
+    found in the source archive.
+    """
+    zinfo = ZipInfo(zi.filename, zi.date_time)
+    zinfo.compress_type = zi.compress_type
+    zinfo.external_attr = zi.external_attr
+    zinfo.CRC = zi.CRC
+    zinfo.compress_size = len(data)
+    zinfo.file_size = zi.file_size
+
+    if not all(hasattr(output, name) for name in RAW_WRITE_ATTRIBUTES):
+        # a ZipFile without the internals used below (before Python 3.6),
+        # the member is compressed again
+        output.writestr(zinfo, _decompress(zi, data))
+        return
+
+    # CRC and sizes are known up front, so the local header is complete and
+    # no data descriptor is needed.
+    with output._lock:
+        if output._writing:
+            raise ValueError("Can't write to the ZIP file while there is an open writing handle")
+        output._writecheck(zinfo)
+        output._didModify = True
+        if output._seekable:
+            output.fp.seek(output.start_dir)
+        zinfo.header_offset = output.fp.tell()
+        output.fp.write(zinfo.FileHeader())
+        output.fp.write(data)
+        output.start_dir = output.fp.tell()
+        output.filelist.append(zinfo)
+        output.NameToInfo[zinfo.filename] = zinfo
+
+
+def _decompress(zi, data):
+    """
+    Returns the contents of the member ``zi`` from its compressed bytes.
+    """
+    if zi.compress_type == ZIP_STORED:
+        return data
+    if zi.compress_type == ZIP_DEFLATED:
+        return zlib.decompress(data, -15)
+    raise NotImplementedError('compression method %d is not supported' % zi.compress_type)
+
+
+def _member_info(zi):
+    """
+    Returns a ZipInfo for writing the member ``zi`` anew. It keeps the
+    timestamp of ``zi`` rather than taking the current time, so the same
+    template and replacements always give the same bytes.
+    """
+    zinfo = ZipInfo(zi.filename, zi.date_time)
+    zinfo.compress_type = ZIP_DEFLATED
+    # the permissions ZipFile sets on members written without any
+    zinfo.external_attr = zi.external_attr or 0o600 << 16
+    return zinfo
+
+
+def _compress(zi, data):
+    """
+    Compresses data for the member zi. Returns a ZipInfo and the compressed
+    bytes, ready for ``_write_raw``.
+    """
+    zinfo = _member_info(zi)
+    zinfo.CRC = zlib.crc32(data) & 0xffffffff
+    zinfo.file_size = len(data)
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    return zinfo, compressor.compress(data) + compressor.flush()
+
+
+_INSTR_TEXT = re.compile(br'<(?:\w+:)?instrText\b[^>]*>([^<]*)<')
+
+
+def _may_have_fields(fp, chunk_size=1 << 16):
+    """
+    Tells whether the XML read from ``fp`` may contain merge fields, without
+    parsing it. The instruction of a complex field can be split over several
+    instrText elements, so these are joined before looking for MERGEFIELD.
+    """
+    instructions = []
+    data = b''
+    while True:
+        chunk = fp.read(chunk_size)
+        data += chunk
+        if b'MERGEFIELD' in data:
+            return True
+        end = 0
+        for match in _INSTR_TEXT.finditer(data):
+            instructions.append(match.group(1))
+            end = match.end() - 1
+        if not chunk:
+            return b'MERGEFIELD' in b''.join(instructions)
+
+        # keep what may be the start of an instrText element, and enough to
+        # find MERGEFIELD where it is cut in two by the next chunk
+        keep = len(data) - len(b'MERGEFIELD') + 1
+        start = data.rfind(b'<', end)
+        if start >= 0 and (len(data) - start < 64 or b'instrText' in data[start:start + 64]):
+            keep = min(keep, start)
+        data = data[max(keep, 0):]
+
+
+def _is_rows(value):
+    """
+    Tells whether a replacement holds rows for ``merge_rows``: any iterable
+    (list, tuple, generator, database cursor, ...) other than a string.
+    """
+    return hasattr(value, '__iter__') and not isinstance(value, (str, bytes, dict))
+
+
+# The elements that can have revision ids (w:rsid* attributes), see
+# MailMerge.__compact
+RSID_TAGS = tuple('{%s}%s' % (NAMESPACES['w'], tag) for tag in ('p', 'r', 'tr', 'sectPr', 'tbl', 'pPr', 'rPr'))
+
+# The children of a run, besides its properties, that can be moved to an
+# adjacent run, see MailMerge.__compact
+PLAIN_RUN_CHILDREN = frozenset('{%s}%s' % (NAMESPACES['w'], tag) for tag in ('t', 'tab', 'br'))
+
+
+def _strip_rsids(element):
+    """
+    Removes the revision ids (w:rsid* attributes) of ``element``.
+    """
+    rsid = '{%(w)s}rsid' % NAMESPACES
+    for name in element.keys():
+        if name.startswith(rsid):
+            del element.attrib[name]
+
+
+def _run_key(run):
+    """
+    Returns what adjacent runs must have in common to be merged into one:
+    their attributes and properties. Returns None for runs that have more
+    than text, tabs and breaks.
+    """
+    rPr = None
+    for child in run:
+        if child.tag == '{%(w)s}rPr' % NAMESPACES:
+            rPr = etree.tostring(child)
+        elif child.tag not in PLAIN_RUN_CHILDREN:
+            return None
+    return sorted(run.items()), rPr
+
+
+def _join_texts(run, index):
+    """
+    Joins the w:t elements of ``run`` around ``index``, where the children of
+    another run were added, as long as Word shows their text as it is.
+    """
+    t = '{%(w)s}t' % NAMESPACES
+    space = '{http://www.w3.org/XML/1998/namespace}space'
+
+    def literal(element):
+        text = element.text or ''
+        return element.get(space) == 'preserve' or text == text.strip()
+
+    if index == 0 or index >= len(run):
+        return
+    first, second = run[index - 1], run[index]
+    if first.tag == t and second.tag == t and literal(first) and literal(second):
+        text = (first.text or '') + (second.text or '')
+        first.text = text
+        if text != text.strip():
+            first.set(space, 'preserve')
+        run.remove(second)
+
+
+def _merged_value(value):
+    """
+    Returns ``value`` as it is merged: the text of a field, or rows as a list
+    of dicts of such values.
+    """
+    if _is_rows(value):
+        return [dict((name, _merged_value(v)) for name, v in row.items()) for row in value]
+    return u'%s' % (value or '')
+
+
+def _lookahead(iterable):
+    """
+    Yields every item of ``iterable`` together with a flag telling whether it
+    is the last one, without needing the length of ``iterable``.
+    """
+    iterator = iter(iterable)
+    try:
+        item = next(iterator)
+    except StopIteration:
+        return
+    for next_item in iterator:
+        yield item, False
+        item = next_item
+    yield item, True
+
 
 class MailMerge(object):
-    def __init__(self, file, remove_empty_tables=False):
-        self.zip = ZipFile(file)
-        self.parts = {}
+    def __init__(self, file, remove_empty_tables=False, stats=None, compact=False):
+        self.parts = _Parts(self.__load_part)
         self.settings = None
         self._settings_info = None
+        self._members = {}
+        self._fields = {}
+        self._rows = {}
         self.remove_empty_tables = remove_empty_tables
+        self.stats = stats
+        # a compiled template has been compacted (or not) already
+        self.compact = compact if not isinstance(file, CompiledTemplate) else file.compact
+
+        with self.__timer('open'):
+            if isinstance(file, CompiledTemplate):
+                self.__init_from_template(file)
+            else:
+                self.__open(file)
 
+    def __open(self, file):
+        if isinstance(file, (bytes, bytearray, memoryview)):
+            file = _BufferFile(file)
+
+        self.zip = ZipFile(file)
         try:
             content_types = etree.parse(self.zip.open('[Content_Types].xml'))
             for file in content_types.findall('{%(ct)s}Override' % NAMESPACES):
                 type = file.attrib['ContentType' % NAMESPACES]
                 if type in CONTENT_TYPES_PARTS:
-                    zi, self.parts[zi] = self.__get_tree_of_file(file)
+                    # Parts are parsed when first needed. Headers and footers
+                    # without merge fields never are, they are copied as-is.
+                    zi = self.__get_info_of_file(file)
+                    with self.zip.open(zi) as fp:
+                        fields = type == CONTENT_TYPES_PARTS[0] or _may_have_fields(fp)
+                    self.parts.add(zi, fields)
                 elif type == CONTENT_TYPE_SETTINGS:
                     self._settings_info, self.settings = self.__get_tree_of_file(file)
 
-            to_delete = []
-
-            for part in self.parts.values():
-
-                for parent in part.findall('.//{%(w)s}fldSimple/..' % NAMESPACES):
-                    for idx, child in enumerate(parent):
-                        if child.tag != '{%(w)s}fldSimple' % NAMESPACES:
-                            continue
-                        instr = child.attrib['{%(w)s}instr' % NAMESPACES]
-
-                        name = self.__parse_instr(instr)
-                        if name is None:
-                            continue
-                        parent[idx] = Element('MergeField', name=name)
-
-                for parent in part.findall('.//{%(w)s}instrText/../..' % NAMESPACES):
-                    children = list(parent)
-                    fields = zip(
-                        [children.index(e) for e in
-                         parent.findall('{%(w)s}r/{%(w)s}fldChar[@{%(w)s}fldCharType="begin"]/..' % NAMESPACES)],
-                        [children.index(e) for e in
-                         parent.findall('{%(w)s}r/{%(w)s}fldChar[@{%(w)s}fldCharType="end"]/..' % NAMESPACES)]
-                    )
-
-                    for idx_begin, idx_end in fields:
-                        # consolidate all instrText nodes between'begin' and 'end' into a single node
-                        begin = children[idx_begin]
-                        instr_elements = [e for e in
-                                          begin.getparent().findall('{%(w)s}r/{%(w)s}instrText' % NAMESPACES)
-                                          if idx_begin < children.index(e.getparent()) < idx_end]
-                        if len(instr_elements) == 0:
-                            continue
-
-                        # set the text of the first instrText element to the concatenation
-                        # of all the instrText element texts
-                        instr_text = ''.join([e.text for e in instr_elements])
-                        instr_elements[0].text = instr_text
-
-                        # delete all instrText elements except the first
-                        for instr in instr_elements[1:]:
-                            instr.getparent().remove(instr)
-
-                        name = self.__parse_instr(instr_text)
-                        if name is None:
-                            continue
-
-                        parent[idx_begin] = Element('MergeField', name=name)
-
-                        # use this so we know *where* to put the replacement
-                        instr_elements[0].tag = 'MergeText'
-                        block = instr_elements[0].getparent()
-                        # append the other tags in the w:r block too
-                        parent[idx_begin].extend(list(block))
-
-                        to_delete += [(parent, parent[i + 1])
-                                      for i in range(idx_begin, idx_end)]
-
-            for parent, child in to_delete:
-                parent.remove(child)
-
             # Remove mail merge settings to avoid error messages when opening document in Winword
             if self.settings:
                 settings_root = self.settings.getroot()
                 mail_merge = settings_root.find('{%(w)s}mailMerge' % NAMESPACES)
                 if mail_merge is not None:
                     settings_root.remove(mail_merge)
+
+            self.__index_parts()
         except:
             self.zip.close()
             raise
 
+    def __init_from_template(self, template):
+        # The template holds the already preprocessed parts, so all that is
+        # left to do is to give this document its own copy of them.
+        self.zip = ZipFile(_BufferFile(template.data))
+        try:
+            for fn, part in template.parts:
+                self.parts[self.zip.getinfo(fn)] = deepcopy(part)
+            if self.stats is not None:
+                self.stats.elements_cloned += len(template.parts)
+            for fn in template.passthrough_parts:
+                self.parts.add(self.zip.getinfo(fn), False)
+            if template.settings is not None:
+                fn, settings = template.settings
+                self._settings_info = self.zip.getinfo(fn)
+                self.settings = deepcopy(settings)
+            self._members = template._members
+
+            self.__index_parts()
+        except BaseException:
+            self.zip.close()
+            raise
+
+    def __convert_fields(self, part):
+        """
+        Replaces every MERGEFIELD in part with a MergeField element.
+        """
+        for field in list(part.iter('{%(w)s}fldSimple' % NAMESPACES)):
+            instr = field.attrib['{%(w)s}instr' % NAMESPACES]
+
+            name = self.__parse_instr(instr)
+            if name is None:
+                continue
+            field.getparent().replace(field, Element('MergeField', name=name))
+
+        parents = []
+        seen = set()
+        for instr in part.iter('{%(w)s}instrText' % NAMESPACES):
+            parent = instr.getparent().getparent()
+            if parent is not None and parent not in seen:
+                seen.add(parent)
+                parents.append(parent)
+
+        for parent in parents:
+            self.__convert_complex_fields(parent)
+
+    def __convert_complex_fields(self, parent):
+        """
+        Replaces the complex fields (begin, instrText, separate and end runs)
+        that are direct children of parent. The runs are walked once, pairing
+        begin and end with a stack, so nested fields are paired correctly.
+        Fields with another field in their instruction are left alone.
+        """
+        fldChar = '{%(w)s}fldChar' % NAMESPACES
+        fldCharType = '{%(w)s}fldCharType' % NAMESPACES
+        instrText = '{%(w)s}instrText' % NAMESPACES
+
+        children = list(parent)
+        stack = []
+        fields = []
+        for idx, run in enumerate(children):
+            if run.tag != '{%(w)s}r' % NAMESPACES:
+                continue
+            for e in run:
+                if e.tag == fldChar:
+                    type = e.get(fldCharType)
+                    if type == 'begin':
+                        if stack and not stack[-1][2]:
+                            # nested in the instruction of the outer field
+                            stack[-1][3] = True
+                        # [begin, instrText elements, separated, has nested]
+                        stack.append([idx, [], False, False])
+                    elif type == 'separate' and stack:
+                        stack[-1][2] = True
+                    elif type == 'end' and stack:
+                        idx_begin, instr_elements, _, nested = stack.pop()
+                        if not nested:
+                            fields.append((idx_begin, idx, instr_elements))
+                elif e.tag == instrText and stack and not stack[-1][2]:
+                    stack[-1][1].append(e)
+
+        merge_fields = []
+        for idx_begin, idx_end, instr_elements in fields:
+            if len(instr_elements) == 0:
+                continue
+
+            # consolidate all instrText nodes between 'begin' and 'end' into a
+            # single node: set the text of the first instrText element to the
+            # concatenation of all the instrText element texts
+            instr_text = ''.join([e.text or '' for e in instr_elements])
+            instr_elements[0].text = instr_text
+
+            # delete all instrText elements except the first
+            for instr in instr_elements[1:]:
+                instr.getparent().remove(instr)
+
+            name = self.__parse_instr(instr_text)
+            if name is not None:
+                merge_fields.append((idx_begin, idx_end, instr_elements[0], name))
+
+        # Fields nested in a merge field are removed together with it
+        merge_fields.sort(key=lambda field: field[0])
+        replaced_until = -1
+        for idx_begin, idx_end, instr, name in merge_fields:
+            if idx_begin <= replaced_until:
+                continue
+            replaced_until = idx_end
+
+            mf = Element('MergeField', name=name)
+            parent.replace(children[idx_begin], mf)
+
+            # use this so we know *where* to put the replacement
+            instr.tag = 'MergeText'
+            block = instr.getparent()
+            # append the other tags in the w:r block too
+            mf.extend(list(block))
+
+            for child in children[idx_begin + 1:idx_end + 1]:
+                parent.remove(child)
+
+    @staticmethod
+    def __compact(part, bookmarks=None):
+        """
+        Removes markup of part that only records how the document was edited
+        and doesn't change how it looks: revision ids (w:rsid* attributes),
+        proofing marks, last rendered page breaks and the _GoBack bookmark.
+        Adjacent runs with the same properties are then merged into one.
+
+        part may also be a single element of a streamed part, see
+        write_merged. The element itself is kept, and bookmarks collects the
+        ids of _GoBack bookmarks, as their ends may be in a later element.
+        """
+        for element in part.iter(*RSID_TAGS):
+            _strip_rsids(element)
+
+        root = part.getroot() if hasattr(part, 'getroot') else part
+        bookmarkStart = '{%(w)s}bookmarkStart' % NAMESPACES
+        if bookmarks is None:
+            bookmarks = set()
+        removed = []
+        for element in part.iter('{%(w)s}proofErr' % NAMESPACES, '{%(w)s}lastRenderedPageBreak' % NAMESPACES,
+                                 bookmarkStart):
+            if element.tag != bookmarkStart:
+                removed.append(element)
+            elif element.get('{%(w)s}name' % NAMESPACES) == '_GoBack':
+                bookmarks.add(element.get('{%(w)s}id' % NAMESPACES))
+                removed.append(element)
+        if bookmarks:
+            removed.extend(end for end in part.iter('{%(w)s}bookmarkEnd' % NAMESPACES)
+                           if end.get('{%(w)s}id' % NAMESPACES) in bookmarks)
+        for element in removed:
+            if element is not root:
+                element.getparent().remove(element)
+
+        previous = previous_key = None
+        for run in list(part.iter('{%(w)s}r' % NAMESPACES)):
+            key = _run_key(run)
+            if key is not None and key == previous_key and run.getprevious() is previous:
+                boundary = len(previous)
+                previous.extend(child for child in list(run) if child.tag != '{%(w)s}rPr' % NAMESPACES)
+                run.getparent().remove(run)
+                _join_texts(previous, boundary)
+            else:
+                previous, previous_key = run, key
+
     @classmethod
     def __parse_instr(cls, instr):
         args = shlex.split(instr, posix=False)
-        if args[0] != 'MERGEFIELD':
+        if len(args) < 2 or args[0] != 'MERGEFIELD':
             return None
         name = args[1]
         if name[0] == '"' and name[-1] == '"':
             name = name[1:-1]
         return name
 
-    def __get_tree_of_file(self, file):
+    def __get_info_of_file(self, file):
         fn = file.attrib['PartName' % NAMESPACES].split('/', 1)[1]
-        zi = self.zip.getinfo(fn)
+        return self.zip.getinfo(fn)
+
+    def __get_tree_of_file(self, file):
+        zi = self.__get_info_of_file(file)
         return zi, etree.parse(self.zip.open(zi))
 
-    def write(self, file):
-        # Replace all remaining merge fields with empty values
-        for field in self.get_merge_fields():
-            self.merge(**{field: ''})
+    def __load_part(self, zi):
+        with self.__timer('parse', zi.filename):
+            part = etree.parse(self.zip.open(zi))
+        with self.__timer('convert_fields', zi.filename):
+            self.__convert_fields(part)
+        if self.compact:
+            with self.__timer('compact', zi.filename):
+                self.__compact(part)
+        self._fields[part] = self.__collect_fields(part)
+        self._rows[part] = self.__collect_rows(part)
+        if self.stats is not None:
+            self.stats.bytes_in += zi.file_size
+        return part
 
-        with ZipFile(file, 'w', ZIP_DEFLATED) as output:
-            for zi in self.zip.filelist:
-                if zi in self.parts:
-                    xml = etree.tostring(self.parts[zi].getroot())
-                    output.writestr(zi.filename, xml)
-                elif zi == self._settings_info:
-                    xml = etree.tostring(self.settings.getroot())
-                    output.writestr(zi.filename, xml)
-                else:
-                    output.writestr(zi.filename, self.zip.read(zi))
+    def __timer(self, phase, part=None):
+        # Times phase when there are stats, see MergeStats.timer
+        if self.stats is None:
+            return _NO_TIMER
+        return self.stats.timer(phase, part)
+
+    def write(self, file, threads=None):
+        """
+        Writes the document to file. With threads, the parts are serialized
+        and compressed by that many threads at the same time, which makes
+        writing documents with several large parts faster. The members are
+        still written in their original order.
+        """
+        with self.__timer('write'):
+            for _ in self.__write(file, threads):
+                pass
+
+    def iter_write(self, threads=None):
+        """
+        Same as ``write``, but yields the document as chunks of bytes while
+        it is written, one or more members at a time. The document can be
+        sent, e.g. as a HTTP response, before all of it is serialized.
+        """
+        sink = _Sink()
+        for _ in self.__write(sink, threads):
+            chunk = sink.take()
+            if chunk:
+                yield chunk
+        chunk = sink.take()
+        if chunk:
+            yield chunk
+
+    def __write(self, file, threads=None):
+        # Writes the document to file, yielding after every member. The
+        # remaining merge fields are written empty, but are left in the
+        # document.
+        blanked = self.__blank_fields([part for zi, part in self.parts.with_fields()])
+        pool = None
+        try:
+            # The parts and settings are compressed by the pool up front, the
+            # other members are copied as they are when their turn comes
+            compressed = {}
+            if threads is not None and threads > 1:
+                pool = ThreadPool(threads)
+                for zi in self.zip.filelist:
+                    if self.parts.is_loaded(zi) or zi == self._settings_info:
+                        compressed[zi] = pool.apply_async(self.__compress_member, (zi,))
+
+            with ZipFile(file, 'w', ZIP_DEFLATED) as output:
+                for zi in self.zip.filelist:
+                    if zi in compressed:
+                        _write_raw(output, *compressed[zi].get())
+                        if self.stats is not None:
+                            self.stats.parts_serialized += 1
+                            self.stats.bytes_out += output.filelist[-1].compress_size
+                    else:
+                        self.__write_member(output, zi)
+                    yield
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+            self.__unblank_fields(blanked)
+
+    def __serialize_member(self, zi):
+        # Returns the XML of the part or settings zi
+        part = self.parts[zi] if self.parts.is_loaded(zi) else self.settings
+        with self.__timer('serialize', zi.filename):
+            return etree.tostring(part.getroot())
+
+    def __compress_member(self, zi):
+        # Returns the ZipInfo and compressed bytes of the part or settings zi,
+        # ready for _write_raw
+        xml = self.__serialize_member(zi)
+        cached = self._members.get(zi.filename)
+        if cached is not None and cached[2] == xml:
+            return cached[0], cached[1]
+        with self.__timer('compress', zi.filename):
+            return _compress(zi, xml)
+
+    def __blank_fields(self, parts):
+        # Swaps the remaining merge fields in parts for empty copies, until
+        # __unblank_fields puts them back.
+        blanked = []
+        for part in parts:
+            for elements in self.__get_fields(part).values():
+                for mf in elements:
+                    if mf.tag == 'MergeField' and mf.getparent() is not None:
+                        blank = deepcopy(mf)
+                        self.__merge_field(blank, '')
+                        mf.getparent().replace(mf, blank)
+                        blanked.append((mf, blank))
+        return blanked
+
+    @staticmethod
+    def __unblank_fields(blanked):
+        for mf, blank in reversed(blanked):
+            blank.getparent().replace(blank, mf)
+
+    def snapshot(self):
+        """
+        Returns the current merge state, which ``restore`` goes back to. This
+        copies the parts that may contain merge fields, parsing them first if
+        needed, which is a lot cheaper than opening the document again.
+        """
+        self.parts.with_fields()
+        loaded = [(zi, deepcopy(part)) for zi, part in self.parts.loaded()]
+        pending = [(zi, self.parts.may_have_fields(zi)) for zi in self.parts if not self.parts.is_loaded(zi)]
+        return loaded, pending
+
+    def restore(self, snapshot):
+        """
+        Goes back to the merge state returned by ``snapshot``, which can be
+        restored as often as needed.
+        """
+        loaded, pending = snapshot
+        for zi, part in loaded:
+            self.parts[zi] = deepcopy(part)
+        for zi, fields in pending:
+            self.parts.add(zi, fields)
+        self.__index_parts()
+
+    def __write_member(self, output, zi):
+        cached = self._members.get(zi.filename)
+        if self.parts.is_loaded(zi) or zi == self._settings_info:
+            xml = self.__serialize_member(zi)
+            if self.stats is not None:
+                self.stats.parts_serialized += 1
+            if cached is not None and cached[2] == xml:
+                with self.__timer('copy', zi.filename):
+                    _write_raw(output, cached[0], cached[1])
+            else:
+                with self.__timer('compress', zi.filename):
+                    output.writestr(_member_info(zi), xml)
+        elif cached is not None:
+            with self.__timer('copy', zi.filename):
+                _write_raw(output, cached[0], cached[1])
+        elif zi.flag_bits & 0x1:
+            # encrypted, can't be copied as-is
+            with self.__timer('compress', zi.filename):
+                output.writestr(_member_info(zi), self.zip.read(zi))
+        else:
+            with self.__timer('copy', zi.filename):
+                _write_raw(output, zi, _read_raw(self.zip, zi))
+        if self.stats is not None:
+            self.stats.bytes_out += output.filelist[-1].compress_size
+
+    def write_merged(self, file, **replacements):
+        """
+        Same as ``merge`` followed by ``write``, but the parts are streamed
+        from the source to ``file`` instead of being parsed as a whole. Only
+        the paragraphs (and other elements inside the body, a table or a
+        cell) of the last few kilobytes read are in memory at a time, so
+        memory use doesn't depend on the size of the document. Rows (list
+        replacements) need the parsed tables, so these are merged the regular
+        way. With compact, the streamed parts are compacted as they are
+        written.
+        """
+        with self.__timer('write_merged'):
+            self.__write_merged(file, replacements)
+
+    def __write_merged(self, file, replacements):
+        if any(_is_rows(value) for value in replacements.values()):
+            self.merge(**replacements)
+            self.write(file)
+            return
+
+        # Parts that have been parsed already are merged as usual
+        loaded = [part for zi, part in self.parts.loaded()]
+        if loaded:
+            self.merge(loaded, **replacements)
+
+        # With compact, every block is compacted like a parsed part, and the
+        # containers (body, tables, rows, ...) lose their revision ids
+        bookmarks = set()
+        tags = ('{%(w)s}fldSimple' % NAMESPACES, '{%(w)s}instrText' % NAMESPACES)
+
+        def merge_block(block):
+            self.__convert_fields(block)
+            if self.compact:
+                self.__compact(block, bookmarks)
+            for mf in list(block.iter('MergeField')):
+                self.__merge_field(mf, replacements.get(mf.attrib['name'], ''))
+
+        blanked = self.__blank_fields(loaded)
+        try:
+            with ZipFile(file, 'w', ZIP_DEFLATED) as output:
+                for zi in self.zip.filelist:
+                    if zi not in self.parts or self.parts.is_loaded(zi) or not self.parts.may_have_fields(zi):
+                        self.__write_member(output, zi)
+                        continue
+
+                    with self.__timer('stream', zi.filename), self.zip.open(zi) as source, \
+                            output.open(_member_info(zi), 'w') as xml:
+                        if self.compact:
+                            writer = _StreamWriter(xml.write, merge_block, None, _strip_rsids)
+                        else:
+                            writer = _StreamWriter(xml.write, merge_block, tags)
+                        for chunk in iter(lambda: source.read(1 << 14), b''):
+                            writer.feed(chunk)
+                        writer.close()
+                    if self.stats is not None:
+                        self.stats.parts_serialized += 1
+                        self.stats.bytes_in += zi.file_size
+                        self.stats.bytes_out += output.filelist[-1].compress_size
+        finally:
+            self.__unblank_fields(blanked)
+
+    def write_templates(self, file, replacements, separator, workers=None, chunksize=64):
+        """
+        Same as ``merge_templates`` followed by ``write``, but each copy of the
+        template is merged and written to ``file`` before the next one is
+        made. Memory use therefore doesn't grow with the number of
+        replacements, which can be any iterable (e.g. a generator). The
+        document itself is left unmerged.
+
+        With workers, the copies are made by a pool of that many worker
+        processes, chunksize replacements at a time, and written in order.
+        The output is the same as without workers.
+        """
+        with self.__timer('write_templates'):
+            self.__write_templates(file, replacements, separator, workers, chunksize)
+
+    def __write_templates(self, file, replacements, separator, workers, chunksize):
+        type, sepClass = self.__split_separator(separator)
+
+        document_info = None
+        for zi, part in self.parts.with_fields():
+            if part.getroot().tag == '{%(w)s}document' % NAMESPACES:
+                document_info = zi
+                break
+        if document_info is None:
+            raise ValueError("Document has no main document part")
+
+        # Work on a copy of the document, which only keeps the parts outside
+        # the body
+        root = deepcopy(self.parts[document_info].getroot())
+        head, tail, copies = self._template_copies(root, type, sepClass, document_info.filename)
+
+        # The remaining merge fields outside the main document part are
+        # written empty
+        other_parts = [part for zi, part in self.parts.with_fields() if zi is not document_info]
+        blanked = self.__blank_fields(other_parts)
+        pool = None
+        try:
+            if workers is not None and workers > 1:
+                # every worker makes its copies from the main document part
+                # as it is now
+                xml = etree.tostring(self.parts[document_info].getroot())
+                pool = multiprocessing.Pool(workers, _init_templates_worker,
+                                            (xml, type, sepClass, self.remove_empty_tables))
+
+            with ZipFile(file, 'w', ZIP_DEFLATED) as output:
+                for zi in self.zip.filelist:
+                    if zi is not document_info:
+                        self.__write_member(output, zi)
+                        continue
+
+                    with output.open(_member_info(zi), 'w') as xml:
+                        xml.write(head)
+                        if pool is None:
+                            fragments = copies(_lookahead(replacements))
+                        else:
+                            fragments = pool.imap(_templates_worker, _shards(_lookahead(replacements), chunksize))
+                        for fragment in fragments:
+                            xml.write(fragment)
+                        xml.write(tail)
+                    if self.stats is not None:
+                        self.stats.parts_serialized += 1
+                        self.stats.bytes_out += output.filelist[-1].compress_size
+            if pool is not None:
+                pool.close()
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+            self.__unblank_fields(blanked)
+
+    def _template_copies(self, root, type, sepClass, name=None):
+        # Prepares root, a copy of the main document part, for writing
+        # copies of the template. Returns the XML before and after the body
+        # contents, and a generator function that yields the XML of the
+        # copies for (replacements, last) pairs. For every copy, the body is
+        # filled with a merged copy of the template, serialized and emptied
+        # again.
+        body, childrenList, mainSection = self.__prepare_templates(root, type, sepClass)
+        body.append(etree.Comment('mailmerge'))
+        head, tail = etree.tostring(root).split(b'<!--mailmerge-->')
+        body.clear()
+
+        def copies(records):
+            for repl, last in records:
+                elements = self.__template_copy(childrenList, mainSection, repl, last, type, sepClass)
+                # Replace all remaining merge fields with empty values
+                fields = self.get_merge_fields(elements)
+                if fields:
+                    self.merge(elements, **dict.fromkeys(fields, ''))
+                body.extend(elements)
+                with self.__timer('serialize', name):
+                    fragment = etree.tostring(root)
+                yield fragment[len(head):len(fragment) - len(tail)]
+                body.clear()
+
+        return head, tail, copies
+
+    def __template_copy(self, childrenList, mainSection, repl, last, type, sepClass):
+        # Returns the elements of a single copy of the template, followed by
+        # the separator or, for the last copy, the last section. The copy is
+        # merged with repl in one go.
+        elements = [deepcopy(n) for n in childrenList]
+        if elements:
+            if last:
+                elements.append(deepcopy(mainSection))
+            elif sepClass == 'section':
+                p = Element('{%(w)s}p' % NAMESPACES)
+                pPr = etree.SubElement(p, '{%(w)s}pPr' % NAMESPACES)
+                pPr.append(deepcopy(mainSection))
+                elements.append(p)
+            elif sepClass == 'break':
+                p = Element('{%(w)s}p' % NAMESPACES)
+                r = etree.SubElement(p, '{%(w)s}r' % NAMESPACES)
+                nbreak = etree.SubElement(r, '{%(w)s}br' % NAMESPACES)
+                nbreak.attrib['{%(w)s}type' % NAMESPACES] = type
+                elements.append(p)
+
+            if self.stats is not None:
+                self.stats.elements_cloned += len(elements)
+            # merged in a body of its own, so tables can be removed from it
+            container = Element('{%(w)s}body' % NAMESPACES)
+            container.extend(elements)
+            self.merge([container], **repl)
+            elements = list(container)
+        return elements
 
     def get_merge_fields(self, parts=None):
         if not parts:
-            parts = self.parts.values()
+            parts = [part for zi, part in self.parts.with_fields()]
         fields = set()
         for part in parts:
-            for mf in part.findall('.//MergeField'):
-                fields.add(mf.attrib['name'])
+            for name, elements in self.__get_fields(part).items():
+                if any(mf.tag == 'MergeField' for mf in elements):
+                    fields.add(name)
+        return fields
+
+    def __index_parts(self):
+        # Maps every part to a {name: [MergeField, ...]} index, so merging
+        # doesn't need to search the whole part for every field.
+        self._fields = dict((part, self.__collect_fields(part))
+                            for zi, part in self.parts.loaded())
+        self._rows = dict((part, self.__collect_rows(part))
+                          for zi, part in self.parts.loaded())
+
+    @staticmethod
+    def __collect_rows(part):
+        # Maps every field name to the table rows containing it, as a list of
+        # (table, row) in the order merge_rows looks for its anchor. Entries
+        # are checked when used, so merged fields and removed tables don't
+        # need to be taken out right away.
+        rows = {}
+        for table in part.iter('{%(w)s}tbl' % NAMESPACES):
+            for row in table:
+                for mf in row.iter('MergeField'):
+                    candidates = rows.setdefault(mf.attrib['name'], [])
+                    if not candidates or candidates[-1][1] is not row:
+                        candidates.append((table, row))
+        return rows
+
+    @staticmethod
+    def __collect_fields(element, fields=None):
+        if fields is None:
+            fields = {}
+        for mf in element.iter('MergeField'):
+            fields.setdefault(mf.attrib['name'], []).append(mf)
         return fields
 
+    def __get_fields(self, part):
+        fields = self._fields.get(part)
+        if fields is None:
+            # not one of the document parts (e.g. a copied table row),
+            # index it on the fly
+            fields = self.__collect_fields(part)
+        return fields
+
+    def __index_detached(self, parts):
+        # Indexes the elements of parts that aren't document parts, for as
+        # long as they are merged, so fields and rows are looked up in them
+        # like in a part. Returns them for __unindex_detached.
+        detached = [part for part in parts if part not in self._fields]
+        for part in detached:
+            self._fields[part] = self.__collect_fields(part)
+            self._rows[part] = self.__collect_rows(part)
+        return detached
+
+    def __unindex_detached(self, detached):
+        for part in detached:
+            del self._fields[part]
+            del self._rows[part]
+
+    def __index_fields(self, part, element):
+        self.__collect_fields(element, self._fields[part])
+
+    def __unindex_fields(self, part, element):
+        fields = self._fields[part]
+        removed = self.__collect_fields(element)
+        for name, elements in removed.items():
+            if name in fields:
+                elements = set(elements)
+                fields[name] = [mf for mf in fields[name] if mf not in elements]
+
     def merge_templates(self, replacements, separator):
         """
         Duplicate template. Creates a copy of the template, does a merge, and separates them by a new paragraph, a new break or a new section break.
@@ -160,90 +942,81 @@ class MailMerge(object):
         - nextColumn_section : nextColumn section break. section begins on the following column on the page. ONLY HAVE EFFECT IF DOCUMENT HAVE COLUMNS
         - nextPage_section : nextPage section break. section begins on the following page.
         - oddPage_section : oddPage section break. section begins on the next odd-numbered page, leaving the next even page blank if necessary.
+        replacements can be any iterable, e.g. a generator; it is consumed one item at a time.
         """
+        with self.__timer('merge_templates'):
+            self.__merge_templates(replacements, separator)
 
-        #TYPE PARAM CONTROL AND SPLIT
-        valid_separators = {'page_break', 'column_break', 'textWrapping_break', 'continuous_section', 'evenPage_section', 'nextColumn_section', 'nextPage_section', 'oddPage_section'}
-        if not separator in valid_separators:
-            raise ValueError("Invalid separator argument")
-        type, sepClass = separator.split("_")
-  
+    def __merge_templates(self, replacements, separator):
+        type, sepClass = self.__split_separator(separator)
 
         #GET ROOT - WORK WITH DOCUMENT
-        for part in self.parts.values():
+        for zi, part in self.parts.with_fields():
             root = part.getroot()
             tag = root.tag
             if tag == '{%(w)s}ftr' % NAMESPACES or tag == '{%(w)s}hdr' % NAMESPACES:
                 continue
-		
-            if sepClass == 'section':
-
-                #FINDING FIRST SECTION OF THE DOCUMENT
-                firstSection = root.find("w:body/w:p/w:pPr/w:sectPr", namespaces=NAMESPACES)
-                if firstSection == None:
-                    firstSection = root.find("w:body/w:sectPr", namespaces=NAMESPACES)
-			
-                #MODIFY TYPE ATTRIBUTE OF FIRST SECTION FOR MERGING
-                nextPageSec = deepcopy(firstSection)
-                for child in nextPageSec:
+
+            body, childrenList, mainSection = self.__prepare_templates(root, type, sepClass)
+
+            #REFILL BODY AND MERGE DOCS - ADD LAST SECTION ENCAPSULATED OR NOT
+            for repl, last in _lookahead(replacements):
+                body.extend(self.__template_copy(childrenList, mainSection, repl, last, type, sepClass))
+
+            self.__index_parts()
+
+    @staticmethod
+    def __split_separator(separator):
+        #TYPE PARAM CONTROL AND SPLIT
+        valid_separators = {'page_break', 'column_break', 'textWrapping_break', 'continuous_section',
+                            'evenPage_section', 'nextColumn_section', 'nextPage_section', 'oddPage_section'}
+        if separator not in valid_separators:
+            raise ValueError("Invalid separator argument")
+        return separator.split("_")
+
+    @staticmethod
+    def __prepare_templates(root, type, sepClass):
+        """
+        Prepares the document for template merging. Returns the body, which is
+        emptied, its former children and the last section.
+        """
+        if sepClass == 'section':
+
+            #FINDING FIRST SECTION OF THE DOCUMENT
+            firstSection = root.find("w:body/w:p/w:pPr/w:sectPr", namespaces=NAMESPACES)
+            if firstSection is None:
+                firstSection = root.find("w:body/w:sectPr", namespaces=NAMESPACES)
+
+            #MODIFY TYPE ATTRIBUTE OF FIRST SECTION FOR MERGING
+            nextPageSec = deepcopy(firstSection)
+            for child in nextPageSec:
                 #Delete old type if exist
-                    if child.tag == '{%(w)s}type' % NAMESPACES:
-                        nextPageSec.remove(child)
-                #Create new type (def parameter)
-                newType = etree.SubElement(nextPageSec, '{%(w)s}type'  % NAMESPACES)
-                newType.set('{%(w)s}val'  % NAMESPACES, type)
+                if child.tag == '{%(w)s}type' % NAMESPACES:
+                    nextPageSec.remove(child)
+            #Create new type (def parameter)
+            newType = etree.SubElement(nextPageSec, '{%(w)s}type' % NAMESPACES)
+            newType.set('{%(w)s}val' % NAMESPACES, type)
 
-                #REPLACING FIRST SECTION
-                secRoot = firstSection.getparent()
-                secRoot.replace(firstSection, nextPageSec)
+            #REPLACING FIRST SECTION
+            secRoot = firstSection.getparent()
+            secRoot.replace(firstSection, nextPageSec)
 
-            #FINDING LAST SECTION OF THE DOCUMENT
-            lastSection = root.find("w:body/w:sectPr", namespaces=NAMESPACES)
+        #FINDING LAST SECTION OF THE DOCUMENT
+        lastSection = root.find("w:body/w:sectPr", namespaces=NAMESPACES)
 
-            #SAVING LAST SECTION
-            mainSection = deepcopy(lastSection)
-            lsecRoot = lastSection.getparent()
-            lsecRoot.remove(lastSection)
+        #SAVING LAST SECTION
+        mainSection = deepcopy(lastSection)
+        lsecRoot = lastSection.getparent()
+        lsecRoot.remove(lastSection)
 
-            #COPY CHILDREN ELEMENTS OF BODY IN A LIST
-            childrenList = root.findall('w:body/*', namespaces=NAMESPACES)
+        #COPY CHILDREN ELEMENTS OF BODY IN A LIST
+        childrenList = root.findall('w:body/*', namespaces=NAMESPACES)
 
-            #DELETE ALL CHILDREN OF BODY
-            for child in root:
-                if child.tag == '{%(w)s}body' % NAMESPACES:
-                    child.clear()
+        #DELETE ALL CHILDREN OF BODY
+        body = root.find('w:body', namespaces=NAMESPACES)
+        body.clear()
 
-            #REFILL BODY AND MERGE DOCS - ADD LAST SECTION ENCAPSULATED OR NOT
-            lr = len(replacements)
-            lc = len(childrenList)
-
-            for i, repl in enumerate(replacements):
-                parts = []
-                for (j, n) in enumerate(childrenList):
-                    element = deepcopy(n)
-                    for child in root:
-                        if child.tag == '{%(w)s}body' % NAMESPACES:
-                            child.append(element)
-                            parts.append(element)
-                            if (j + 1) == lc:
-                                if (i + 1) == lr:
-                                    child.append(mainSection)
-                                    parts.append(mainSection)
-                                else:
-                                    if sepClass == 'section':
-                                        intSection = deepcopy(mainSection)
-                                        p   = etree.SubElement(child, '{%(w)s}p'  % NAMESPACES)
-                                        pPr = etree.SubElement(p, '{%(w)s}pPr'  % NAMESPACES)
-                                        pPr.append(intSection)
-                                        parts.append(p)
-                                    elif sepClass == 'break':
-                                        pb   = etree.SubElement(child, '{%(w)s}p'  % NAMESPACES)
-                                        r = etree.SubElement(pb, '{%(w)s}r'  % NAMESPACES)
-                                        nbreak = Element('{%(w)s}br' % NAMESPACES)
-                                        nbreak.attrib['{%(w)s}type' % NAMESPACES] = type
-                                        r.append(nbreak)
-
-                    self.merge(parts, **repl)
+        return body, childrenList, mainSection
 
     def merge_pages(self, replacements):
          """
@@ -255,72 +1028,227 @@ class MailMerge(object):
          self.merge_templates(replacements, "page_break")
 
     def merge(self, parts=None, **replacements):
+        with self.__timer('merge'):
+            self.__merge(parts, replacements)
+
+    def __merge(self, parts, replacements):
         if not parts:
-            parts = self.parts.values()
+            parts = [part for zi, part in self.parts.with_fields()]
 
-        for field, replacement in replacements.items():
-            if isinstance(replacement, list):
-                self.merge_rows(field, replacement)
-            else:
-                for part in parts:
-                    self.__merge_field(part, field, replacement)
-
-    def __merge_field(self, part, field, text):
-        for mf in part.findall('.//MergeField[@name="%s"]' % field):
-            children = list(mf)
-            mf.clear()  # clear away the attributes
-            mf.tag = '{%(w)s}r' % NAMESPACES
-            mf.extend(children)
-
-            nodes = []
-            # preserve new lines in replacement text
-            text = text or ''  # text might be None
-            text_parts = str(text).replace('\r', '').split('\n')
-            for i, text_part in enumerate(text_parts):
-                text_node = Element('{%(w)s}t' % NAMESPACES)
-                text_node.text = text_part
-                nodes.append(text_node)
-
-                # if not last node add new line node
-                if i < (len(text_parts) - 1):
-                    nodes.append(Element('{%(w)s}br' % NAMESPACES))
-
-            ph = mf.find('MergeText')
-            if ph is not None:
-                # add text nodes at the exact position where
-                # MergeText was found
-                index = mf.index(ph)
-                for node in reversed(nodes):
-                    mf.insert(index, node)
-                mf.remove(ph)
-            else:
-                mf.extend(nodes)
+        # rows are merged in the same parts, e.g. in a copy of the template
+        # for merge_templates, which is merged before it is added
+        detached = self.__index_detached(parts)
+        try:
+            indexes = [self._fields[part] for part in parts]
+            for field, replacement in replacements.items():
+                if _is_rows(replacement):
+                    self.merge_rows(field, replacement, parts)
+                else:
+                    for fields in indexes:
+                        for mf in fields.pop(field, ()):
+                            self.__merge_field(mf, replacement)
+        finally:
+            self.__unindex_detached(detached)
+
+    def __merge_field(self, mf, text):
+        if mf.tag != 'MergeField':
+            # already replaced through another part or row
+            return
+        if self.stats is not None:
+            self.stats.fields_merged += 1
+
+        children = list(mf)
+        mf.clear()  # clear away the attributes
+        mf.tag = '{%(w)s}r' % NAMESPACES
+        mf.extend(children)
 
-    def merge_rows(self, anchor, rows):
-        table, idx, template = self.__find_row_anchor(anchor)
+        nodes = []
+        # preserve new lines in replacement text
+        text = text or ''  # text might be None
+        text_parts = str(text).replace('\r', '').split('\n')
+        for i, text_part in enumerate(text_parts):
+            text_node = Element('{%(w)s}t' % NAMESPACES)
+            text_node.text = text_part
+            nodes.append(text_node)
+
+            # if not last node add new line node
+            if i < (len(text_parts) - 1):
+                nodes.append(Element('{%(w)s}br' % NAMESPACES))
+
+        ph = mf.find('MergeText')
+        if ph is not None:
+            # add text nodes at the exact position where
+            # MergeText was found
+            index = mf.index(ph)
+            for node in reversed(nodes):
+                mf.insert(index, node)
+            mf.remove(ph)
+        else:
+            mf.extend(nodes)
+
+    def merge_rows(self, anchor, rows, parts=None):
+        """
+        Replaces the table row with the field anchor by a merged copy for
+        every row. The row is looked for in the document parts, or in parts,
+        which may also be elements that aren't part of the document (e.g.
+        a copy of the template for merge_templates).
+        """
+        with self.__timer('merge_rows'):
+            detached = self.__index_detached(parts or ())
+            try:
+                self.__merge_rows(anchor, rows, parts)
+            finally:
+                self.__unindex_detached(detached)
+
+    def __merge_rows(self, anchor, rows, parts):
+        part, table, idx, template = self.__find_row_anchor(anchor, parts)
         if table is not None:
-            if len(rows) > 0:
-                del table[idx]
-                for i, row_data in enumerate(rows):
-                    row = deepcopy(template)
-                    self.merge([row], **row_data)
-                    table.insert(idx + i, row)
+            # Locate the fields of the template row once, as paths of child
+            # indexes, so they can be looked up directly in every copy
+            fields = [(mf.attrib['name'], self.__path(template, mf)) for mf in template.iter('MergeField')]
+            index = self._fields[part]
+
+            # rows can be any iterable, which is consumed one row at a time
+            new_rows = []
+            anchors = {}
+            for row_data in rows:
+                if not new_rows:
+                    del table[idx]
+                    self.__unindex_fields(part, template)
+
+                row = deepcopy(template)
+                left = []
+                for name, mf in [(name, self.__follow(row, path)) for name, path in fields]:
+                    value = row_data.get(name)
+                    if name in row_data and not _is_rows(value):
+                        self.__merge_field(mf, value)
+                    else:
+                        left.append((name, mf))
+                nested = [(name, value) for name, value in row_data.items() if _is_rows(value)]
+                if nested:
+                    # rows of a table inside the row go into the copy, which
+                    # isn't in the table yet
+                    for name, value in nested:
+                        self.merge_rows(name, value, [row])
+                    left = [(mf.attrib['name'], mf) for mf in row.iter('MergeField')]
+                for name, mf in left:
+                    index.setdefault(name, []).append(mf)
+                    rows_of_field = anchors.setdefault(name, [])
+                    if not rows_of_field or rows_of_field[-1] is not row:
+                        rows_of_field.append(row)
+                new_rows.append(row)
+
+            if self.stats is not None:
+                self.stats.elements_cloned += len(new_rows)
+            if new_rows:
+                table[idx:idx] = new_rows
+                self.__reindex_rows(part, table, template, set(name for name, path in fields), anchors)
             else:
                 # if there is no data for a given table
                 # we check whether table needs to be removed
                 if self.remove_empty_tables:
                     parent = table.getparent()
                     parent.remove(table)
+                    self.__unindex_fields(part, table)
+
+    def __reindex_rows(self, part, table, template, names, anchors):
+        # The copies take the place of the template row in the anchor index,
+        # for the fields that are left in them.
+        if any(True for _ in template.iter('{%(w)s}tbl' % NAMESPACES)):
+            # the copies contain tables of their own, which are simplest
+            # found by indexing the part again
+            self._rows[part] = self.__collect_rows(part)
+            return
+        for name in names:
+            candidates = self._rows[part].get(name, [])
+            for i, (t, row) in enumerate(candidates):
+                if row is template:
+                    candidates[i:i + 1] = [(table, row) for row in anchors.get(name, [])]
+                    break
+
+    @staticmethod
+    def __path(root, element):
+        path = []
+        while element is not root:
+            parent = element.getparent()
+            path.append(parent.index(element))
+            element = parent
+        path.reverse()
+        return path
+
+    @staticmethod
+    def __follow(root, path):
+        for idx in path:
+            root = root[idx]
+        return root
 
     def __find_row_anchor(self, field, parts=None):
         if not parts:
-            parts = self.parts.values()
+            parts = [part for zi, part in self.parts.with_fields()]
         for part in parts:
-            for table in part.findall('.//{%(w)s}tbl' % NAMESPACES):
-                for idx, row in enumerate(table):
-                    if row.find('.//MergeField[@name="%s"]' % field) is not None:
-                        return table, idx, row
-        return None, None, None
+            candidates = self._rows.get(part)
+            if candidates is None:
+                candidates = self._rows[part] = self.__collect_rows(part)
+            candidates = candidates.get(field, [])
+            while candidates:
+                table, row = candidates[0]
+                if row.getparent() is table and self.__is_attached(table, part) and \
+                        any(mf.attrib['name'] == field for mf in row.iter('MergeField')):
+                    return part, table, table.index(row), row
+                # stale entry, the row was merged or removed
+                del candidates[0]
+        return None, None, None, None
+
+    @staticmethod
+    def __is_attached(element, part):
+        # Tells whether element is still in part, a document part or an
+        # element merged on its own
+        root = part.getroot() if hasattr(part, 'getroot') else part
+        top = element
+        for top in element.iterancestors():
+            if top is root:
+                return True
+        return top is root
+
+    @classmethod
+    def render_many(cls, template, records, output_factory=None, workers=None, ordered=True, chunksize=8):
+        """
+        Renders one document per record using a pool of worker processes.
+        template is a file name, file or CompiledTemplate; it is compiled once
+        and loaded once per worker. output_factory(index, record) returns the
+        file name to write the document for a record to. Without it, the
+        documents are returned as bytes.
+
+        Yields (index, output, error) for every record, where output is the
+        file name or bytes and error the exception raised while rendering the
+        record, if any. Results are yielded in the order of records, or as
+        soon as they are done when ordered is False. Records are read only
+        up to two chunks of chunksize per worker ahead of the results taken.
+        With workers=1 all records are rendered in this process.
+        """
+        if not isinstance(template, CompiledTemplate):
+            template = CompiledTemplate(template)
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+
+        if workers == 1:
+            _init_render_worker(template, output_factory)
+            for task in enumerate(records):
+                yield _render_worker(task)
+            return
+
+        pool = multiprocessing.Pool(workers, _init_render_worker, (template, output_factory))
+        try:
+            # Records are read and results kept only for a few shards per
+            # worker at a time, not as fast as the pool takes them
+            shards = _shards(enumerate(records), chunksize)
+            for results in _imap_bounded(pool, _render_shard, shards, workers * 2, ordered):
+                for result in results:
+                    yield result
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
 
     def __enter__(self):
         return self
@@ -334,3 +1262,902 @@ class MailMerge(object):
                 self.zip.close()
             finally:
                 self.zip = None
+
+
+class CompiledTemplate(object):
+    """
+    A template that is unzipped, parsed and preprocessed only once. Pass it
+    instead of a file to ``MailMerge`` to get a document that can be merged
+    and written as usual. Every document works on its own copy of the parts,
+    so the template itself is never modified and can be reused for as many
+    documents as needed.
+
+    With compact, the parts are compacted as with ``MailMerge(file,
+    compact=True)``.
+    """
+    def __init__(self, file, compact=False):
+        if isinstance(file, (bytes, bytearray, memoryview)):
+            self.data = bytes(file)
+        elif hasattr(file, 'read'):
+            self.data = file.read()
+        else:
+            with open(file, 'rb') as fp:
+                self.data = fp.read()
+
+        self.compact = compact
+        with MailMerge(self.data, compact=compact) as document:
+            self.parts = [(zi.filename, part) for zi, part in document.parts.with_fields()]
+            # estimated memory use, the data plus the parsed parts
+            self.size = len(self.data) + TREE_SIZE_FACTOR * sum(
+                zi.file_size for zi, part in document.parts.loaded())
+            # headers and footers without fields, which are copied as-is
+            self.passthrough_parts = [zi.filename for zi in document.parts if not document.parts.is_loaded(zi)]
+            self.settings = None
+            if document.settings is not None:
+                self.settings = (document._settings_info.filename, document.settings)
+
+            # The compressed bytes of all members besides the parts, shared by
+            # all documents made from this template, as {name: (ZipInfo,
+            # compressed, uncompressed)}. Only the settings, which have been
+            # changed when opening the document, need to be compressed here.
+            self.filelist = document.zip.filelist
+            self._members = {}
+            data = memoryview(self.data)
+            for zi in self.filelist:
+                if document.parts.is_loaded(zi):
+                    continue
+                if zi == document._settings_info:
+                    xml = etree.tostring(document.settings.getroot())
+                    self._members[zi.filename] = _compress(zi, xml) + (xml,)
+                elif not zi.flag_bits & 0x1:
+                    offset = _raw_offset(document.zip, zi)
+                    self._members[zi.filename] = (zi, data[offset:offset + zi.compress_size], None)
+        self._chunks = None
+        self._digest = None
+
+    @property
+    def digest(self):
+        """
+        The SHA-256 hex digest of the template file.
+        """
+        if self._digest is None:
+            self._digest = hashlib.sha256(self.data).hexdigest()
+        return self._digest
+
+    def __getstate__(self):
+        # the parsed parts can't be pickled, compile again after unpickling
+        return {'data': self.data, 'compact': self.compact}
+
+    def __setstate__(self, state):
+        self.__init__(state['data'], state.get('compact', False))
+
+    def render(self, file, **replacements):
+        """
+        Merges the replacements into a new document and writes it to file.
+        This is the same as::
+
+            with MailMerge(template) as document:
+                document.merge(**replacements)
+                document.write(file)
+
+        but instead of copying and merging the parsed parts, the parts are
+        serialized once with a slot for every field, and the document is
+        rendered by joining the serialized chunks and the escaped
+        replacements. Rows (list replacements) are merged the regular way.
+        """
+        if self._chunks is None:
+            self._chunks = self.__compile_chunks()
+
+        if not self._chunks or any(_is_rows(value) for value in replacements.values()):
+            with MailMerge(self) as document:
+                document.merge(**replacements)
+                document.write(file)
+            return
+
+        with ZipFile(file, 'w', ZIP_DEFLATED) as output:
+            for zi in self.filelist:
+                chunks = self._chunks.get(zi.filename)
+                cached = self._members.get(zi.filename)
+                if chunks is not None:
+                    output.writestr(_member_info(zi), chunks.render(replacements))
+                elif cached is not None:
+                    _write_raw(output, cached[0], cached[1])
+                else:
+                    # encrypted, can't be copied as-is
+                    with ZipFile(_BufferFile(self.data)) as source:
+                        output.writestr(_member_info(zi), source.read(zi.filename))
+
+    def __compile_chunks(self):
+        # Every field is merged with a unique token, which is then looked up in
+        # the serialized parts to split them into chunks. Returns an empty dict
+        # if the tokens didn't end up where expected.
+        prefix = 'mailmerge%s' % uuid.uuid4().hex
+        with MailMerge(self) as document:
+            fields = sorted(document.get_merge_fields())
+            document.merge(**dict((name, '%s%dx' % (prefix, i)) for i, name in enumerate(fields)))
+
+            chunks = {}
+            for zi, part in document.parts.with_fields():
+                xml = etree.tostring(part.getroot())
+                chunks[zi.filename] = _Chunks.split(xml, prefix.encode('ascii'), fields)
+                if chunks[zi.filename] is None:
+                    return {}
+        return chunks
+
+
+class TemplateCache(object):
+    """
+    A thread-safe cache of compiled templates, which keeps the templates that
+    were used last. Templates are evicted when there are more than
+    ``max_entries`` of them, or when their estimated memory use exceeds
+    ``max_bytes`` (see ``CompiledTemplate.size``).
+
+    Files are looked up by path and modification time, so a changed file is
+    compiled again. Bytes and file-like objects are looked up by the digest of
+    their content. With compact, the templates are compiled with
+    ``compact=True``.
+    """
+    def __init__(self, max_entries=32, max_bytes=256 << 20, compact=False):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.compact = compact
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size = 0
+        self._templates = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, file):
+        """
+        Returns the CompiledTemplate of file, compiling it if it isn't cached.
+        """
+        if isinstance(file, (bytes, bytearray, memoryview)):
+            data = file
+            key = hashlib.sha256(file).hexdigest()
+        elif hasattr(file, 'read'):
+            data = file.read()
+            key = hashlib.sha256(data).hexdigest()
+        else:
+            data = file
+            stat = os.stat(file)
+            key = (os.path.abspath(file), stat.st_mtime, stat.st_size)
+
+        with self._lock:
+            template = self._templates.pop(key, None)
+            if template is not None:
+                self._templates[key] = template
+                self.hits += 1
+                return template
+            self.misses += 1
+
+        # compiled outside of the lock, so cached templates can be used in
+        # the meantime
+        template = CompiledTemplate(data, compact=self.compact)
+        with self._lock:
+            if template.size > self.max_bytes:
+                return template
+            previous = self._templates.pop(key, None)
+            if previous is not None:
+                self.size -= previous.size
+            self._templates[key] = template
+            self.size += template.size
+            while len(self._templates) > self.max_entries or self.size > self.max_bytes:
+                key, evicted = self._templates.popitem(last=False)
+                self.size -= evicted.size
+                self.evictions += 1
+        return template
+
+    def open(self, file):
+        """
+        Returns a new MailMerge of the cached template of file, which can be
+        merged and written as usual without changing the cached template.
+        """
+        return MailMerge(self.get(file))
+
+    def clear(self):
+        with self._lock:
+            self._templates.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._templates)
+
+
+class RenderCache(object):
+    """
+    A cache of documents rendered from compiled templates, kept as files in
+    ``directory``. A document that was rendered before from the same
+    template and replacements (rows included) is copied from the cache
+    rather than merged and written again. Documents are stored under the
+    digest of the template and of the replacements, so changed templates and
+    records are rendered again. The documents used least recently are
+    removed when they take more than ``max_bytes`` together.
+
+    Rendered documents only depend on the template and the replacements, so
+    a cached document has the same bytes as a newly rendered one. Values are
+    hashed as the text they are merged as, so e.g. ``Decimal('0')`` and
+    ``''`` share a document. Rows can be any iterable, as with ``merge``.
+    """
+    def __init__(self, directory, max_bytes=1 << 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.size = sum(size for filename, size, used in self.__entries())
+
+    @staticmethod
+    def key(template, replacements):
+        """
+        Returns the key of the document of template (a CompiledTemplate)
+        merged with replacements, a hex digest. Rows that aren't a list or
+        tuple are consumed.
+        """
+        replacements = dict((name, _merged_value(value)) for name, value in replacements.items())
+        data = json.dumps(replacements, sort_keys=True, separators=(',', ':'))
+        # compacted templates give other documents
+        prefix = '%s:%d\0' % (template.digest, template.compact)
+        return hashlib.sha256(prefix.encode('ascii') + data.encode('utf-8')).hexdigest()
+
+    def path(self, template, **replacements):
+        """
+        Returns the file name of the cached document of template merged with
+        replacements, rendering it first if it isn't cached. The file can be
+        linked or sent as it is, but must not be changed. It is removed when
+        it is evicted.
+        """
+        # rows may be generators, which can only be consumed once
+        replacements = dict((name, _merged_value(value)) for name, value in replacements.items())
+        filename = os.path.join(self.directory, self.key(template, replacements) + '.docx')
+        try:
+            # the modification time tells which documents were used last
+            os.utime(filename, None)
+        except OSError:
+            pass
+        else:
+            with self._lock:
+                self.hits += 1
+            return filename
+
+        with self._lock:
+            self.misses += 1
+        fd, temp = tempfile.mkstemp('.tmp', dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                template.render(fp, **replacements)
+            size = os.path.getsize(temp)
+            # moved into place when complete, so other threads and processes
+            # never see a partial document
+            os.replace(temp, filename)
+        except Exception:
+            os.remove(temp)
+            raise
+        with self._lock:
+            self.size += size
+            if self.size > self.max_bytes:
+                self.__evict(filename)
+        return filename
+
+    def get(self, template, **replacements):
+        """
+        Returns the document of template merged with replacements as bytes,
+        from the cache if possible.
+        """
+        with open(self.path(template, **replacements), 'rb') as fp:
+            return fp.read()
+
+    def render(self, template, file, **replacements):
+        """
+        Same as ``template.render(file, **replacements)``, but copies the
+        document from the cache if possible.
+        """
+        with open(self.path(template, **replacements), 'rb') as source:
+            if hasattr(file, 'write'):
+                shutil.copyfileobj(source, file)
+            else:
+                with open(file, 'wb') as fp:
+                    shutil.copyfileobj(source, fp)
+
+    def clear(self):
+        with self._lock:
+            for filename, size, used in self.__entries():
+                self.__remove(filename)
+            self.size = 0
+
+    def __len__(self):
+        return len(self.__entries())
+
+    def __entries(self):
+        # Returns the cached documents as (file name, size, last used)
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.docx'):
+                filename = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(filename)
+                except OSError:
+                    continue
+                entries.append((filename, stat.st_size, stat.st_mtime))
+        return entries
+
+    def __evict(self, keep):
+        # Removes the documents used least recently, besides keep, until the
+        # cache fits in max_bytes. The directory may be shared with other
+        # processes, so the size is counted again.
+        entries = sorted(self.__entries(), key=lambda entry: entry[2])
+        self.size = sum(size for filename, size, used in entries)
+        for filename, size, used in entries:
+            if self.size <= self.max_bytes:
+                break
+            if filename != keep and self.__remove(filename):
+                self.size -= size
+                self.evictions += 1
+
+    @staticmethod
+    def __remove(filename):
+        try:
+            os.remove(filename)
+        except OSError:
+            return False
+        return True
+
+
+class MergeStats(object):
+    """
+    Wall time and counters of the work done by a MailMerge, for profiling.
+    Pass it as ``stats`` when opening a document; the same MergeStats can be
+    passed to several documents to add up their work.
+
+    ``times`` holds the seconds spent per phase: ``open``, ``parse`` and
+    ``convert_fields`` (parts are parsed when first used), ``merge``,
+    ``merge_rows``, ``merge_templates``, ``write``, ``write_templates`` and
+    ``write_merged`` and, while writing, ``serialize``, ``compress`` and
+    ``copy`` (members copied without being decompressed) and ``stream``
+    (parts merged by ``write_merged``). Phases include the phases they use,
+    e.g. ``merge`` includes the ``merge_rows`` for list replacements.
+    ``part_times`` holds the same per part, as {part name: {phase: seconds}}.
+
+    Subclasses can override ``add_time`` to pass the times on, e.g. to a
+    metrics library.
+    """
+    def __init__(self):
+        self.times = {}
+        self.part_times = {}
+        # including the fields that are written empty
+        self.fields_merged = 0
+        self.elements_cloned = 0
+        self.parts_serialized = 0
+        # the uncompressed size of the parts read and the compressed size of
+        # the members written
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._running = set()
+        self._lock = threading.Lock()
+
+    def timer(self, phase, part=None):
+        """
+        Returns a context manager that adds the time spent in it to phase.
+        Phases that are already being timed, such as merge_rows for nested
+        rows, aren't counted again.
+        """
+        if (phase, part) in self._running:
+            return _NO_TIMER
+        return _Timer(self, phase, part)
+
+    def add_time(self, phase, seconds, part=None):
+        # parts may be written by several threads, see MailMerge.write
+        with self._lock:
+            self.times[phase] = self.times.get(phase, 0.0) + seconds
+            if part is not None:
+                times = self.part_times.setdefault(part, {})
+                times[phase] = times.get(phase, 0.0) + seconds
+
+    def as_dict(self):
+        """
+        Returns the times and counters as a dict that can be serialized as
+        JSON.
+        """
+        return {
+            'times': dict(self.times),
+            'part_times': dict((part, dict(times)) for part, times in self.part_times.items()),
+            'fields_merged': self.fields_merged,
+            'elements_cloned': self.elements_cloned,
+            'parts_serialized': self.parts_serialized,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+        }
+
+
+_render_template = None
+_render_output_factory = None
+
+
+def _init_render_worker(template, output_factory):
+    global _render_template, _render_output_factory
+    _render_template = template
+    _render_output_factory = output_factory
+
+
+def _render_worker(task):
+    index, record = task
+    try:
+        if _render_output_factory is None:
+            output = BytesIO()
+            _render_template.render(output, **record)
+            return index, output.getvalue(), None
+
+        output = _render_output_factory(index, record)
+        _render_template.render(output, **record)
+        return index, output, None
+    except Exception as e:
+        return index, None, e
+
+
+def _render_shard(tasks):
+    return [_render_worker(task) for task in tasks]
+
+
+def _imap_bounded(pool, func, tasks, window, ordered=True):
+    """
+    Like ``pool.imap`` (or ``imap_unordered``), but with at most ``window``
+    tasks submitted and not yet yielded, so ``tasks`` is read no faster than
+    the results are taken.
+    """
+    done = queue.Queue()
+    callback = None if ordered else done.put
+    pending = deque()
+
+    def submit():
+        # submits the next task, if there is one
+        for task in tasks:
+            pending.append(pool.apply_async(func, (task,), callback=callback, error_callback=callback))
+            return
+
+    for i in range(window):
+        submit()
+    while pending:
+        if ordered:
+            result = pending.popleft().get()
+        else:
+            pending.pop()
+            result = done.get()
+            if isinstance(result, BaseException):
+                raise result
+        submit()
+        yield result
+
+
+_templates_copies = None
+
+
+def _init_templates_worker(xml, type, sepClass, remove_empty_tables):
+    global _templates_copies
+    # The fields of the main document part have been converted already, so
+    # it is parsed as is and merged through a document without parts
+    document = MailMerge(_empty_package(), remove_empty_tables)
+    head, tail, _templates_copies = document._template_copies(etree.fromstring(xml), type, sepClass)
+
+
+def _templates_worker(records):
+    return b''.join(_templates_copies(records))
+
+
+def _empty_package():
+    """
+    Returns a package without any parts, as bytes.
+    """
+    package = BytesIO()
+    with ZipFile(package, 'w') as output:
+        output.writestr('[Content_Types].xml', etree.tostring(Element('{%(ct)s}Types' % NAMESPACES)))
+    return package.getvalue()
+
+
+def _shards(iterable, size):
+    """
+    Yields the items of ``iterable`` in lists of ``size`` items, the last one
+    possibly shorter.
+    """
+    shard = []
+    for item in iterable:
+        shard.append(item)
+        if len(shard) == size:
+            yield shard
+            shard = []
+    if shard:
+        yield shard
+
+
+class _Chunks(object):
+    """
+    A serialized part split into static chunks and field slots, see
+    ``CompiledTemplate.render``.
+    """
+    invalid_characters = re.compile(u'[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]')
+
+    def __init__(self, static, names, tags):
+        self.static = static
+        self.names = names
+        self.tags = tags
+
+    @classmethod
+    def split(cls, xml, prefix, fields):
+        # A merged field serializes as <w:t>token</w:t>, where the prefix of
+        # the text element depends on the namespaces of the part.
+        slot = re.compile(b'<([^<>/]*)t>' + prefix + b'(\\d+)x</\\1t>')
+        static, names, tags = [], [], []
+        start = 0
+        for match in slot.finditer(xml):
+            static.append(xml[start:match.start()])
+            names.append(fields[int(match.group(2))])
+            tags.append(match.group(1))
+            start = match.end()
+        static.append(xml[start:])
+        if sum(chunk.count(prefix) for chunk in static):
+            return None
+        return cls(static, names, tags)
+
+    def render(self, replacements):
+        xml = [self.static[0]]
+        rendered = {}
+        for name, tag, chunk in zip(self.names, self.tags, self.static[1:]):
+            key = (name, tag)
+            if key not in rendered:
+                rendered[key] = self.render_text(replacements.get(name), tag)
+            xml.append(rendered[key])
+            xml.append(chunk)
+        return b''.join(xml)
+
+    @classmethod
+    def render_text(cls, text, tag):
+        # Same as MailMerge.__merge_field, serialized like etree.tostring does
+        text = text or ''  # text might be None
+        text = u'%s' % text
+        if cls.invalid_characters.search(text):
+            raise ValueError('All strings must be XML compatible: Unicode or ASCII, '
+                             'no NULL bytes or control characters')
+        nodes = []
+        for text_part in text.replace('\r', '').split('\n'):
+            text_part = text_part.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+            nodes.append(b''.join((b'<', tag, b't>', text_part.encode('ascii', 'xmlcharrefreplace'), b'</', tag,
+                                   b't>')))
+        return (b'<' + tag + b'br/>').join(nodes)
+
+
+class _Parts(MutableMapping):
+    """
+    The parts of a document, as {ZipInfo: ElementTree}. Parts added with
+    ``add`` are parsed by ``load`` when they are first accessed.
+    """
+    def __init__(self, load):
+        self._load = load
+        self._trees = {}
+        self._pending = {}
+        self._order = []
+
+    def add(self, zi, fields=True):
+        """
+        Adds the part ``zi`` without parsing it. ``fields`` tells whether it
+        may contain merge fields.
+        """
+        if zi not in self:
+            self._order.append(zi)
+        self._trees.pop(zi, None)
+        self._pending[zi] = fields
+
+    def is_loaded(self, zi):
+        return zi in self._trees
+
+    def may_have_fields(self, zi):
+        return self._pending.get(zi, True)
+
+    def loaded(self):
+        """
+        Returns the items of the parts that have been parsed.
+        """
+        return [(zi, self._trees[zi]) for zi in self._order if zi in self._trees]
+
+    def with_fields(self):
+        """
+        Returns the items of the parts that may contain merge fields, parsing
+        them if needed.
+        """
+        return [(zi, self[zi]) for zi in self._order if self._pending.get(zi, True)]
+
+    def __getitem__(self, zi):
+        try:
+            return self._trees[zi]
+        except KeyError:
+            if zi not in self._pending:
+                raise
+        tree = self._trees[zi] = self._load(zi)
+        del self._pending[zi]
+        return tree
+
+    def __setitem__(self, zi, tree):
+        if zi not in self:
+            self._order.append(zi)
+        self._pending.pop(zi, None)
+        self._trees[zi] = tree
+
+    def __delitem__(self, zi):
+        if zi in self._trees:
+            del self._trees[zi]
+        else:
+            del self._pending[zi]
+        self._order.remove(zi)
+
+    def __contains__(self, zi):
+        return zi in self._trees or zi in self._pending
+
+    def __iter__(self):
+        return iter(list(self._order))
+
+    def __len__(self):
+        return len(self._order)
+
+
+class _StreamWriter(object):
+    """
+    Parses the XML fed to it and writes it to ``write`` as it goes, see
+    ``MailMerge.write_merged``. The parsed tree is pruned as soon as possible:
+    the complete elements inside the open containers (see
+    ``STREAM_CONTAINERS``) are written and removed from the tree, a batch at a
+    time. Before that, the ones containing any of ``tags`` (all of them if
+    ``tags`` is None) are passed to ``process``. With ``clean``, it is called
+    with every container before its start tag is serialized.
+    """
+    def __init__(self, write, process, tags, clean=None):
+        self._sink = write
+        self._buffer = []
+        self._buffered = 0
+        self._process = process
+        self._tags = tags
+        self._clean = clean
+        self._parser = etree.XMLPullParser(events=('start', 'end'),
+                                           tag=STREAM_CONTAINERS | {'{%(w)s}p' % NAMESPACES})
+        self._placeholder = 'mailmerge%s' % uuid.uuid4().hex
+        # the open containers, as [element, start tag, end tag, namespace
+        # declarations added to its children when serialized on their own,
+        # start tag written, closed child that only needs its tail written,
+        # last paragraph that ended in it]
+        self._containers = []
+        self._done = False
+
+    def feed(self, data):
+        self._parser.feed(data)
+        self._handle_events()
+
+    def close(self):
+        self._parser.close()
+        self._handle_events()
+        self._sink(b''.join(self._buffer))
+        self._buffer = []
+
+    def _write(self, data):
+        # many small pieces are written, pass them on in larger blocks
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if self._buffered > 1 << 16:
+            self._sink(b''.join(self._buffer))
+            self._buffer = []
+            self._buffered = 0
+
+    def _handle_events(self):
+        # The parser is ahead of the events, so the tree may hold more than
+        # the events tell. Paragraphs are written once all events of the data
+        # fed so far are handled, which keeps what is serialized again on the
+        # next batch small.
+        for event, element in self._parser.read_events():
+            if self._done:
+                continue
+            top = self._containers[-1] if self._containers else None
+            if top is None:
+                self._open_container(element, None)
+            elif event == 'start':
+                if element.tag in STREAM_CONTAINERS and element.getparent() is top[0]:
+                    self._flush(top, element)
+                    self._open_container(element, top)
+            elif element is top[0]:
+                self._close_container()
+            elif element.getparent() is top[0]:
+                top[6] = element
+
+        if self._containers and self._containers[-1][6] is not None:
+            # the last paragraph itself is written with the next batch, when
+            # its tail is complete
+            self._flush(self._containers[-1], self._containers[-1][6])
+
+    def _open_container(self, element, parent):
+        if self._clean is not None:
+            self._clean(element)
+        xml = etree.tostring(element)
+        end = xml.index(b'>')
+        if xml[end - 1:end] == b'/':
+            start_tag = xml[:end - 1] + b'>'
+        else:
+            start_tag = xml[:end + 1]
+        if parent is not None:
+            start_tag = self._strip_declarations(start_tag, parent[3])
+        end_tag = b'</' + re.match(br'<([^\s/>]+)', start_tag).group(1) + b'>'
+
+        probe = etree.SubElement(element, 'probe')
+        declarations = re.findall(br' xmlns(?::[^=]*)?="[^"]*"', etree.tostring(probe))
+        element.remove(probe)
+
+        self._containers.append([element, start_tag, end_tag, declarations, False, None, None])
+
+    def _close_container(self):
+        container = self._containers[-1]
+        self._flush(container, None)
+        self._containers.pop()
+        element, start_tag, end_tag, declarations, written, closed, ended = container
+        if written:
+            self._write(end_tag)
+        else:
+            # empty, written as a single tag
+            self._write_start_tags()
+            self._write(start_tag[:-1] + b'/>')
+
+        if self._containers:
+            self._containers[-1][5] = element
+        else:
+            self._done = True
+
+    def _write_start_tags(self):
+        for container in self._containers:
+            if not container[4]:
+                self._write(container[1])
+                container[4] = True
+
+    def _flush(self, container, until):
+        # writes the text and the complete children of container, up to until
+        element = container[0]
+        closed = container[5]
+        container[6] = None
+        if closed is not None:
+            # its tail is complete now that there is a next child
+            container[5] = None
+            if closed.tail:
+                self._write(self._escape(closed.tail))
+            element.remove(closed)
+
+        batch = []
+        for child in element:
+            if child is until:
+                break
+            batch.append(child)
+        if not batch and not element.text:
+            return
+
+        # look for the tags in the whole container at once, rather than in
+        # every child
+        if self._tags is None:
+            found = batch
+        else:
+            members = set(batch)
+            found = []
+            for match in element.iter(*self._tags):
+                while match.getparent() is not element:
+                    match = match.getparent()
+                if match in members and match not in found:
+                    found.append(match)
+        for child in found:
+            self._process(child)
+
+        self._write_start_tags()
+        placeholder = etree.Comment(self._placeholder)
+        if until is None:
+            element.append(placeholder)
+        else:
+            until.addprevious(placeholder)
+        xml = etree.tostring(element)
+        start = xml.index(b'>') + 1
+        self._write(xml[start:xml.index(b'<!--%s-->' % self._placeholder.encode('ascii'), start)])
+        element.text = None
+        del element[:len(batch) + 1]
+
+    @staticmethod
+    def _strip_declarations(xml, declarations):
+        # removes the namespace declarations that are inherited from the
+        # containers from the start tag
+        end = xml.index(b'>')
+        for declaration in declarations:
+            i = xml.find(declaration, 0, end)
+            if i > 0:
+                xml = xml[:i] + xml[i + len(declaration):]
+                end -= len(declaration)
+        return xml
+
+    @staticmethod
+    def _escape(text):
+        holder = etree.Element('text')
+        holder.text = text
+        return etree.tostring(holder)[len(b'<text>'):-len(b'</text>')]
+
+
+class _Timer(object):
+    """
+    Adds the time spent in a with block to a MergeStats, see
+    ``MergeStats.timer``.
+    """
+    def __init__(self, stats, phase, part):
+        self._stats = stats
+        self._key = (phase, part)
+        self._start = None
+
+    def __enter__(self):
+        self._stats._running.add(self._key)
+        self._start = _clock()
+
+    def __exit__(self, type, value, traceback):
+        elapsed = _clock() - self._start
+        self._stats._running.discard(self._key)
+        self._stats.add_time(self._key[0], elapsed, self._key[1])
+
+
+class _NoTimer(object):
+    def __enter__(self):
+        pass
+
+    def __exit__(self, type, value, traceback):
+        pass
+
+
+_NO_TIMER = _NoTimer()
+
+
+class _BufferFile(RawIOBase):
+    """
+    Read-only file on a bytes-like object, which isn't copied.
+    """
+    def __init__(self, data):
+        self._data = memoryview(data).cast('B')
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._data[self._position:self._position + len(buffer)]
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def seek(self, offset, whence=0):
+        if whence == 1:
+            offset += self._position
+        elif whence == 2:
+            offset += len(self._data)
+        self._position = offset
+        return offset
+
+    def tell(self):
+        return self._position
+
+
+class _Sink(object):
+    """
+    Non-seekable file that keeps what is written until it is taken, see
+    ``MailMerge.iter_write``.
+    """
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        chunk = b''.join(self._chunks)
+        self._chunks = []
+        return chunk
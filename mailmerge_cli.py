@@ -0,0 +1,394 @@
+"""
+Command line interface of docx-mailmerge, installed as ``docx-mailmerge``.
+
+    docx-mailmerge merge template.docx records.csv -o 'letter-{index}.docx'
+    docx-mailmerge merge template.docx records.jsonl --combined letters.docx
+    docx-mailmerge serve letter=template.docx --port 8000
+"""
+from __future__ import print_function
+
+import argparse
+import csv
+import io
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+import timeit
+from io import BytesIO
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn, UnixStreamServer
+except ImportError:  # Python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn, UnixStreamServer
+
+from mailmerge import MailMerge, CompiledTemplate
+
+SEPARATORS = ('page_break', 'column_break', 'textWrapping_break', 'continuous_section', 'evenPage_section',
+              'nextColumn_section', 'nextPage_section', 'oddPage_section')
+
+DOCX_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+
+
+class DataError(Exception):
+    pass
+
+
+def read_records(file, format=None, encoding='utf-8'):
+    """
+    Yields the records of a CSV file (with a header row) or JSON Lines file,
+    one at a time. ``file`` is a file name, or ``-`` for standard input. The
+    format is guessed from the extension if not given. Lists of objects in
+    JSON Lines records are merged as rows.
+    """
+    if format is None:
+        format = 'jsonl' if file.endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+    if file == '-':
+        fp = io.open(sys.stdin.fileno(), 'r', encoding=encoding, newline='', closefd=False)
+    else:
+        fp = io.open(file, 'r', encoding=encoding, newline='')
+    with fp:
+        if format == 'csv':
+            for record in csv.DictReader(fp):
+                yield record
+            return
+
+        for number, line in enumerate(fp, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                raise DataError('%s, line %d: %s' % (file, number, e))
+            if not isinstance(record, dict):
+                raise DataError('%s, line %d: expected an object' % (file, number))
+            yield record
+
+
+class OutputPattern(object):
+    """
+    Returns the output file name of a record, by formatting ``pattern`` with
+    the record's index (from 0) as ``index`` and its fields.
+    """
+    def __init__(self, pattern):
+        self.pattern = pattern
+
+    def __call__(self, index, record):
+        fields = dict((name, value) for name, value in record.items() if not isinstance(value, (list, dict)))
+        fields['index'] = index
+        return self.pattern.format(**fields)
+
+
+def merge(args):
+    start = timeit.default_timer()
+    records = read_records(args.data, args.format, args.encoding)
+
+    if args.combined:
+        # written next to the output and renamed when done, so a failed run
+        # doesn't leave a partial document behind
+        temp = '%s.%d.tmp' % (args.combined, os.getpid())
+        counted = _Counter(records)
+        try:
+            with MailMerge(args.template) as document:
+                document.write_templates(temp, counted, args.separator,
+                                         workers=args.jobs if args.jobs > 1 else None)
+            os.replace(temp, args.combined)
+        except DataError:
+            _remove(temp)
+            raise
+        except Exception as error:
+            _remove(temp)
+            print('%s: %s: %s' % (args.combined, type(error).__name__, error), file=sys.stderr)
+            _summary(counted.count, 1, timeit.default_timer() - start, args.quiet)
+            return 1
+        _summary(counted.count, 0, timeit.default_timer() - start, args.quiet)
+        return 0
+
+    template = CompiledTemplate(args.template)
+    count = errors = 0
+    results = MailMerge.render_many(template, records, OutputPattern(args.output), workers=args.jobs, ordered=False)
+    for index, output, error in results:
+        count += 1
+        if error is not None:
+            errors += 1
+            print('record %d: %s: %s' % (index, type(error).__name__, error), file=sys.stderr)
+        elif args.verbose:
+            print(output)
+    _summary(count, errors, timeit.default_timer() - start, args.quiet)
+    return 1 if errors else 0
+
+
+class _Counter(object):
+    # Counts the items of an iterable as they are consumed
+    def __init__(self, iterable):
+        self.iterable = iterable
+        self.count = 0
+
+    def __iter__(self):
+        for item in self.iterable:
+            self.count += 1
+            yield item
+
+
+def _remove(filename):
+    try:
+        os.remove(filename)
+    except OSError:
+        pass
+
+
+def _summary(count, errors, elapsed, quiet):
+    if quiet:
+        return
+    print('%d records in %.2f s (%.1f records/s), %d errors' % (
+        count, elapsed, count / elapsed if elapsed else 0.0, errors), file=sys.stderr)
+
+
+class RenderService(object):
+    """
+    Renders documents from templates that are compiled once, on a pool of
+    ``workers`` processes that load the templates when they start. The
+    service of ``docx-mailmerge serve``.
+
+    ``templates`` maps template ids to file names, files or compiled
+    templates.
+    """
+    def __init__(self, templates, workers=None):
+        self.templates = dict((id, template if isinstance(template, CompiledTemplate) else CompiledTemplate(template))
+                              for id, template in templates.items())
+        self.workers = workers or multiprocessing.cpu_count()
+        self.started = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.rendered = dict((id, {'documents': 0, 'seconds': 0.0}) for id in self.templates)
+        self._lock = threading.Lock()
+        self._pool = multiprocessing.Pool(self.workers, _init_service_worker, (self.templates,))
+
+    def render(self, id, record):
+        """
+        Returns the document of template ``id`` merged with ``record``, as
+        bytes. Raises KeyError for unknown templates.
+        """
+        if id not in self.templates:
+            raise KeyError(id)
+        start = timeit.default_timer()
+        try:
+            data = self._pool.apply(_service_worker, (id, record))
+        except Exception:
+            with self._lock:
+                self.requests += 1
+                self.errors += 1
+            raise
+        with self._lock:
+            self.requests += 1
+            self.rendered[id]['documents'] += 1
+            self.rendered[id]['seconds'] += timeit.default_timer() - start
+        return data
+
+    def health(self):
+        return {'status': 'ok', 'templates': sorted(self.templates), 'workers': self.workers}
+
+    def stats(self):
+        with self._lock:
+            return {
+                'uptime': time.time() - self.started,
+                'requests': self.requests,
+                'errors': self.errors,
+                'templates': dict((id, dict(rendered)) for id, rendered in self.rendered.items()),
+            }
+
+    def close(self):
+        self._pool.terminate()
+        self._pool.join()
+
+
+_service_templates = None
+
+
+def _init_service_worker(templates):
+    global _service_templates
+    _service_templates = templates
+    # Ctrl+C and signals sent to the process group of the server are left to
+    # the server, which stops the workers itself. A worker killed while
+    # waiting for a job would leave the pool unable to stop.
+    if hasattr(os, 'setpgrp'):
+        os.setpgrp()
+
+
+def _service_worker(id, record):
+    output = BytesIO()
+    _service_templates[id].render(output, **record)
+    return output.getvalue()
+
+
+class RenderHandler(BaseHTTPRequestHandler):
+    """
+    The HTTP interface of a RenderService, ``server.service``:
+
+    ``POST /render/<template id>`` with a JSON object as body returns the
+    merged document. ``GET /health`` and ``GET /stats`` return JSON.
+    """
+    def do_GET(self):
+        if self.path == '/health':
+            self.send_json(200, self.server.service.health())
+        elif self.path == '/stats':
+            self.send_json(200, self.server.service.stats())
+        else:
+            self.send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if not self.path.startswith('/render/'):
+            self.send_json(404, {'error': 'not found'})
+            return
+        id = self.path[len('/render/'):]
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            record = json.loads(self.rfile.read(length).decode('utf-8'))
+            if not isinstance(record, dict):
+                raise ValueError('expected an object')
+        except ValueError as e:
+            self.send_json(400, {'error': 'invalid record: %s' % e})
+            return
+
+        try:
+            data = self.server.service.render(id, record)
+        except KeyError:
+            self.send_json(404, {'error': 'unknown template %r' % id})
+            return
+        except Exception as e:
+            self.send_json(500, {'error': '%s: %s' % (type(e).__name__, e)})
+            return
+        self.send(200, DOCX_TYPE, data)
+
+    def send_json(self, status, value):
+        self.send(status, 'application/json', json.dumps(value).encode('utf-8'))
+
+    def send(self, status, content_type, data):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def address_string(self):
+        # clients of a Unix socket have no address
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+
+class RenderServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service, quiet=False):
+        HTTPServer.__init__(self, address, RenderHandler)
+        self.service = service
+        self.quiet = quiet
+
+
+class UnixRenderServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, service, quiet=False):
+        UnixStreamServer.__init__(self, path, RenderHandler)
+        self.service = service
+        self.quiet = quiet
+
+
+def serve(args):
+    templates = {}
+    for template in args.templates:
+        id, sep, file = template.partition('=')
+        if not sep:
+            id, file = os.path.splitext(os.path.basename(template))[0], template
+        templates[id] = file
+
+    service = RenderService(templates, args.jobs)
+    try:
+        if args.socket:
+            server = UnixRenderServer(args.socket, service, args.quiet)
+            address = args.socket
+        else:
+            server = RenderServer((args.host, args.port), service, args.quiet)
+            address = 'http://%s:%d' % server.server_address[:2]
+        print('serving %s on %s with %d workers' % (', '.join(sorted(templates)), address, service.workers),
+              file=sys.stderr)
+        signal.signal(signal.SIGTERM, _interrupt)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            if args.socket:
+                os.remove(args.socket)
+    finally:
+        service.close()
+    return 0
+
+
+def _interrupt(signum, frame):
+    # stop serving on SIGTERM as on Ctrl+C
+    raise KeyboardInterrupt
+
+
+def parser():
+    parser = argparse.ArgumentParser(prog='docx-mailmerge', description='Mail merge for docx files.')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    command = commands.add_parser('merge', help='merge a template with the records of a CSV or JSON Lines file',
+                                  description='Merges a template with every record of a CSV file (with a header '
+                                              'row) or JSON Lines file, which is read one record at a time.')
+    command.add_argument('template', help='the template, a .docx file')
+    command.add_argument('data', help='the records, a .csv or .jsonl file, or - for standard input')
+    command.add_argument('--format', choices=('csv', 'jsonl'),
+                         help='the format of the records (default: guessed from the extension)')
+    command.add_argument('--encoding', default='utf-8', help='the encoding of the records (default: utf-8)')
+    command.add_argument('-o', '--output', default='output-{index}.docx',
+                         help='the file name of the document of every record, formatted with the index of the '
+                              'record (from 0) and its fields (default: output-{index}.docx)')
+    command.add_argument('--combined', metavar='FILE',
+                         help='write a single document with a merged copy of the template for every record')
+    command.add_argument('--separator', choices=SEPARATORS, default='page_break',
+                         help='the separator between the copies in a combined document (default: page_break)')
+    command.add_argument('-j', '--jobs', type=int, default=1, help='the number of worker processes (default: 1)')
+    command.add_argument('-v', '--verbose', action='store_true', help='print the file name of every document')
+    command.add_argument('-q', '--quiet', action='store_true', help="don't print the summary")
+    command.set_defaults(run=merge)
+
+    command = commands.add_parser('serve', help='render documents over HTTP',
+                                  description='Renders documents over HTTP, on localhost or a Unix socket. The '
+                                              'templates are compiled once and merged by a pool of worker processes. '
+                                              'POST a JSON object to /render/<template id> to get the merged '
+                                              'document; GET /health and /stats return JSON.')
+    command.add_argument('templates', nargs='+', metavar='[ID=]TEMPLATE',
+                         help='a template to serve, with its id (default: the file name without extension)')
+    command.add_argument('--host', default='127.0.0.1', help='the address to listen on (default: 127.0.0.1)')
+    command.add_argument('--port', type=int, default=8000, help='the port to listen on (default: 8000)')
+    command.add_argument('--socket', help='listen on this Unix socket instead')
+    command.add_argument('-j', '--jobs', type=int, help='the number of worker processes (default: number of cores)')
+    command.add_argument('-q', '--quiet', action='store_true', help="don't log requests")
+    command.set_defaults(run=serve)
+    return parser
+
+
+def main(argv=None):
+    args = parser().parse_args(argv)
+    try:
+        return args.run(args)
+    except (DataError, IOError, OSError) as e:
+        print('docx-mailmerge: %s' % e, file=sys.stderr)
+        return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
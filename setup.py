@@ -16,7 +16,10 @@ setup(name='docx-mailmerge',
       author_email='bouke@haarsma.eu',
       url='http://github.com/Bouke/docx-mailmerge',
       license='MIT',
-      py_modules=['mailmerge'],
+      py_modules=['mailmerge', 'mailmerge_cli'],
+      entry_points={
+          'console_scripts': ['docx-mailmerge = mailmerge_cli:main'],
+      },
       zip_safe=False,
       install_requires=['lxml']
 )
@@ -0,0 +1,119 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stderr
+from os import path
+
+from mailmerge_cli import main, read_records
+from tests.utils import document_xml
+
+TEMPLATE = path.join(path.dirname(__file__), 'test_merge_table_rows.docx')
+
+
+class CommandLineTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_data(self, filename, data):
+        filename = path.join(self.directory, filename)
+        with io.open(filename, 'w', encoding='utf-8') as fp:
+            fp.write(data)
+        return filename
+
+    def run_main(self, *args):
+        stderr = io.StringIO()
+        with redirect_stderr(stderr):
+            status = main(list(args))
+        return status, stderr.getvalue()
+
+    def test_read_records(self):
+        csv = self.write_data('records.csv', u'student_name,thesis_grade\r\nAlice,A\r\nBob,B\r\n')
+        self.assertEqual(list(read_records(csv)), [
+            {'student_name': 'Alice', 'thesis_grade': 'A'},
+            {'student_name': 'Bob', 'thesis_grade': 'B'},
+        ])
+
+        jsonl = self.write_data('records.jsonl', u'{"student_name": "Alice"}\n\n{"class_code": [{"class_code": 1}]}\n')
+        self.assertEqual(list(read_records(jsonl)), [
+            {'student_name': 'Alice'},
+            {'class_code': [{'class_code': 1}]},
+        ])
+
+    def test_document_per_record(self):
+        data = self.write_data('records.csv', u'student_name,thesis_grade\nAlice,A\nBob,B\n')
+        output = path.join(self.directory, '{index}-{student_name}.docx')
+        status, stderr = self.run_main('merge', TEMPLATE, data, '-o', output, '--jobs', '2')
+
+        self.assertEqual(status, 0)
+        self.assertIn('2 records in', stderr)
+        self.assertIn(b'<w:t>Alice</w:t>', document_xml(path.join(self.directory, '0-Alice.docx')))
+        self.assertIn(b'<w:t>Bob</w:t>', document_xml(path.join(self.directory, '1-Bob.docx')))
+
+    def test_rows(self):
+        record = {'student_name': 'Alice', 'class_code': [
+            {'class_code': 'ECON101', 'class_name': 'Economics 101', 'class_grade': 'A'},
+            {'class_code': 'OPRES', 'class_name': 'Operations Research', 'class_grade': 'B'},
+        ]}
+        data = self.write_data('records.jsonl', json.dumps(record) + u'\n')
+        output = path.join(self.directory, 'output-{index}.docx')
+        status, stderr = self.run_main('merge', TEMPLATE, data, '-o', output)
+
+        self.assertEqual(status, 0)
+        xml = document_xml(path.join(self.directory, 'output-0.docx'))
+        self.assertIn(b'<w:t>ECON101</w:t>', xml)
+        self.assertIn(b'<w:t>Operations Research</w:t>', xml)
+
+    def test_combined(self):
+        records = [
+            {'student_name': 'Alice', 'class_code': [{'class_code': 'ECON101'}, {'class_code': 'OPRES'}]},
+            {'student_name': 'Bob', 'class_code': [{'class_code': 'ECON101'}]},
+        ]
+        data = self.write_data('records.jsonl', u''.join(json.dumps(record) + u'\n' for record in records))
+        output = path.join(self.directory, 'combined.docx')
+        for jobs in ('1', '2'):
+            status, stderr = self.run_main('merge', TEMPLATE, data, '--combined', output,
+                                           '--separator', 'nextPage_section', '--jobs', jobs)
+
+            self.assertEqual(status, 0)
+            self.assertIn('2 records in', stderr)
+            xml = document_xml(output)
+            self.assertIn(b'<w:t>Alice</w:t>', xml)
+            self.assertIn(b'<w:t>Bob</w:t>', xml)
+            self.assertIn(b'w:val="nextPage"', xml)
+            # the rows of every record are merged into its own copy
+            self.assertEqual(xml.count(b'<w:t>ECON101</w:t>'), 2)
+            self.assertEqual(xml.count(b'<w:t>OPRES</w:t>'), 1)
+
+    def test_errors(self):
+        data = self.write_data('records.csv', u'student_name\nAlice\n')
+        output = path.join(self.directory, '{missing}.docx')
+        status, stderr = self.run_main('merge', TEMPLATE, data, '-o', output)
+
+        self.assertEqual(status, 1)
+        self.assertIn("record 0: KeyError: 'missing'", stderr)
+        self.assertIn('1 records in', stderr)
+        self.assertIn('1 errors', stderr)
+
+    def test_combined_errors(self):
+        data = self.write_data('records.jsonl', u'{"student_name": "Alice"}\n{"student_name": "\\u0001"}\n')
+        output = path.join(self.directory, 'combined.docx')
+        for jobs in ('1', '2'):
+            status, stderr = self.run_main('merge', TEMPLATE, data, '--combined', output, '--jobs', jobs)
+
+            self.assertEqual(status, 1)
+            self.assertIn('combined.docx: ValueError', stderr)
+            self.assertIn('1 errors', stderr)
+            # no partial document is left behind
+            self.assertEqual(os.listdir(self.directory), ['records.jsonl'])
+
+    def test_invalid_data(self):
+        data = self.write_data('records.jsonl', u'{"student_name": "Alice"}\n{"student_name"\n')
+        status, stderr = self.run_main('merge', TEMPLATE, data, '-o', path.join(self.directory, '{index}.docx'))
+        self.assertEqual(status, 2)
+        self.assertIn('records.jsonl, line 2', stderr)
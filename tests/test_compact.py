@@ -0,0 +1,95 @@
+import glob
+import pickle
+import unittest
+from io import BytesIO
+from os import path
+
+from lxml import etree
+
+from mailmerge import NAMESPACES, CompiledTemplate, MailMerge
+from tests.utils import document_xml
+
+TEMPLATE = path.join(path.dirname(__file__), 'test_merge_table_rows.docx')
+ROWS = [
+    {'class_code': 'ECON101', 'class_name': 'Economics 101', 'class_grade': 'A'},
+    {'class_code': 'OPRES', 'class_name': 'Operations Research', 'class_grade': 'B'},
+]
+
+
+def written(compact, **replacements):
+    with MailMerge(TEMPLATE, compact=compact) as document:
+        document.merge(**replacements)
+        output = BytesIO()
+        document.write(output)
+    return document_xml(output.getvalue())
+
+
+def paragraph_texts(xml):
+    return [''.join(p.itertext()) for p in etree.fromstring(xml).iter('{%(w)s}p' % NAMESPACES)]
+
+
+class CompactTest(unittest.TestCase):
+    def test_noise_removed(self):
+        original = written(False, student_name='Bouke Haarsma', class_code=ROWS)
+        compacted = written(True, student_name='Bouke Haarsma', class_code=ROWS)
+
+        for noise in (b'w:rsid', b'w:proofErr', b'_GoBack'):
+            self.assertIn(noise, original)
+            self.assertNotIn(noise, compacted)
+        self.assertLess(len(compacted), len(original))
+        # the text of every paragraph is the same, in fewer runs
+        self.assertEqual(paragraph_texts(compacted), paragraph_texts(original))
+        runs = '{%(w)s}r' % NAMESPACES
+        self.assertLess(len(etree.fromstring(compacted).findall('.//' + runs)),
+                        len(etree.fromstring(original).findall('.//' + runs)))
+
+    def test_same_text(self):
+        for filename in glob.glob(path.join(path.dirname(__file__), '*.docx')):
+            xml = []
+            for compact in (False, True):
+                with MailMerge(filename, compact=compact) as document:
+                    document.merge(**dict((name, 'value of %s' % name) for name in document.get_merge_fields()))
+                    output = BytesIO()
+                    document.write(output)
+                xml.append(document_xml(output.getvalue()))
+            self.assertEqual(paragraph_texts(xml[1]), paragraph_texts(xml[0]), filename)
+
+    def test_fields(self):
+        with MailMerge(TEMPLATE) as original, MailMerge(TEMPLATE, compact=True) as compacted:
+            self.assertEqual(compacted.get_merge_fields(), original.get_merge_fields())
+
+    def test_merge_templates(self):
+        texts = []
+        for compact in (False, True):
+            with MailMerge(TEMPLATE, compact=compact) as document:
+                document.merge_templates([{'student_name': 'One'}, {'student_name': 'Two'}], separator='page_break')
+                output = BytesIO()
+                document.write(output)
+            texts.append(paragraph_texts(document_xml(output.getvalue())))
+        self.assertEqual(texts[1], texts[0])
+
+    def test_compiled_template(self):
+        template = CompiledTemplate(TEMPLATE, compact=True)
+        self.assertTrue(MailMerge(template).compact)
+        self.assertTrue(pickle.loads(pickle.dumps(template)).compact)
+
+        output = BytesIO()
+        template.render(output, student_name='Bouke Haarsma')
+        xml = document_xml(output.getvalue())
+        self.assertNotIn(b'w:rsid', xml)
+        self.assertEqual(paragraph_texts(xml), paragraph_texts(written(False, student_name='Bouke Haarsma')))
+
+    def test_write_merged(self):
+        # streamed parts are compacted the same way as parsed ones
+        for filename in ('test_merge_table_rows.docx', 'test_winword2010.docx'):
+            filename = path.join(path.dirname(__file__), filename)
+            with MailMerge(filename, compact=True) as document:
+                replacements = dict((name, 'value of %s' % name) for name in document.get_merge_fields())
+                document.merge(**replacements)
+                expected = BytesIO()
+                document.write(expected)
+
+            with MailMerge(filename, compact=True) as document:
+                output = BytesIO()
+                document.write_merged(output, **replacements)
+            self.assertEqual(document_xml(output.getvalue()), document_xml(expected.getvalue()), filename)
@@ -0,0 +1,88 @@
+import unittest
+import tempfile
+from os import path
+from zipfile import ZipFile
+from lxml import etree
+
+from mailmerge import MailMerge, CompiledTemplate, NAMESPACES
+from tests.utils import EtreeMixin, get_document_body_part
+
+
+class CompiledTemplateTest(EtreeMixin, unittest.TestCase):
+    def setUp(self):
+        self.path = path.join(path.dirname(__file__), 'test_merge_table_rows.docx')
+        self.template = CompiledTemplate(self.path)
+
+    def merge(self, document):
+        document.merge(
+            student_name='Bouke Haarsma',
+            study='Industrial Engineering and Management',
+            thesis_grade='A',
+            class_code=[
+                {'class_code': 'ECON101', 'class_name': 'Economics 101', 'class_grade': 'A'},
+                {'class_code': 'OPRES', 'class_name': 'Operations Research', 'class_grade': 'A'},
+            ]
+        )
+        with tempfile.TemporaryFile() as outfile:
+            document.write(outfile)
+
+    def test_same_result_as_file(self):
+        with MailMerge(self.path) as document:
+            self.merge(document)
+            expected_tree = get_document_body_part(document).getroot()
+
+        with MailMerge(self.template) as document:
+            self.assertEqual(document.get_merge_fields(),
+                             {'student_name', 'study_name', 'class_name', 'class_code', 'class_grade',
+                              'thesis_grade'})
+            self.merge(document)
+            self.assert_equal_tree(expected_tree, get_document_body_part(document).getroot())
+
+    def test_template_is_not_modified(self):
+        before = [etree.tostring(part) for _, part in self.template.parts]
+
+        for _ in range(2):
+            with MailMerge(self.template) as document:
+                self.merge(document)
+
+        self.assertEqual(before, [etree.tostring(part) for _, part in self.template.parts])
+
+    def test_documents_are_independent(self):
+        first = MailMerge(self.template)
+        second = MailMerge(self.template)
+        first.merge(student_name='Bouke Haarsma')
+
+        self.assertNotIn('student_name', first.get_merge_fields())
+        self.assertIn('student_name', second.get_merge_fields())
+
+        first.close()
+        second.close()
+
+    def test_file_object(self):
+        with open(self.path, 'rb') as fp:
+            template = CompiledTemplate(fp)
+
+        with MailMerge(template) as document:
+            self.assertIn('class_code', document.get_merge_fields())
+
+    def test_members_are_shared(self):
+        outputs = []
+        for _ in range(2):
+            with MailMerge(self.template) as document, tempfile.TemporaryFile() as outfile:
+                self.merge(document)
+                document.write(outfile)
+                with ZipFile(outfile) as output:
+                    self.assertIsNone(output.testzip())
+                    outputs.append(dict((zi.filename, (zi.CRC, output.read(zi))) for zi in output.infolist()))
+
+        self.assertEqual(outputs[0], outputs[1])
+        settings = outputs[0]['word/settings.xml'][1]
+        self.assertNotIn(b'mailMerge', settings)
+        self.assertEqual(settings, self.template._members['word/settings.xml'][2])
+
+    def test_changed_settings_are_written(self):
+        with MailMerge(self.template) as document, tempfile.TemporaryFile() as outfile:
+            document.settings.getroot().append(etree.Element('{%(w)s}evenAndOddHeaders' % NAMESPACES))
+            document.write(outfile)
+            with ZipFile(outfile) as output:
+                self.assertIn(b'evenAndOddHeaders', output.read('word/settings.xml'))
@@ -0,0 +1,48 @@
+import unittest
+import tempfile
+from os import path
+
+from mailmerge import MailMerge
+
+
+class FieldIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.document = MailMerge(path.join(path.dirname(__file__), 'test_merge_table_rows.docx'),
+                                  remove_empty_tables=True)
+
+    def tearDown(self):
+        self.document.close()
+
+    def test_merged_fields_are_removed(self):
+        self.document.merge(student_name='Bouke Haarsma', thesis_grade='A')
+        self.assertEqual(self.document.get_merge_fields(),
+                         {'study_name', 'class_name', 'class_code', 'class_grade'})
+
+    def test_fields_of_copied_rows(self):
+        self.document.merge_rows('class_code', [
+            {'class_code': 'ECON101'},
+            {'class_code': 'OPRES'},
+        ])
+        self.assertEqual(self.document.get_merge_fields(),
+                         {'student_name', 'study_name', 'class_name', 'class_grade', 'thesis_grade'})
+
+        # the fields left in the copied rows are merged in a later call
+        self.document.merge(class_name='Economics 101', class_grade='A')
+        self.assertEqual(self.document.get_merge_fields(),
+                         {'student_name', 'study_name', 'thesis_grade'})
+
+        rows = self.document.parts[self.document.zip.getinfo('word/document.xml')].getroot().findall(
+            './/{http://schemas.openxmlformats.org/wordprocessingml/2006/main}tbl/'
+            '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}tr')
+        self.assertEqual(
+            ['Economics 101', 'Economics 101'],
+            [row.findall('.//{http://schemas.openxmlformats.org/wordprocessingml/2006/main}t')[1].text
+             for row in rows[1:3]])
+
+    def test_fields_of_removed_table(self):
+        self.document.merge_rows('class_code', [])
+        self.assertEqual(self.document.get_merge_fields(), {'student_name', 'study_name'})
+
+        with tempfile.TemporaryFile() as outfile:
+            self.document.write(outfile)
+        self.assertEqual(self.document.get_merge_fields(), {'student_name', 'study_name'})
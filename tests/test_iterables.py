@@ -0,0 +1,65 @@
+import unittest
+import tempfile
+from os import path
+
+from mailmerge import MailMerge
+from tests.utils import EtreeMixin, get_document_body_part
+
+ROWS = [
+    {'class_code': 'ECON101', 'class_name': 'Economics 101', 'class_grade': 'A'},
+    {'class_code': 'ECONADV', 'class_name': 'Economics Advanced', 'class_grade': 'B'},
+    {'class_code': 'OPRES', 'class_name': 'Operations Research', 'class_grade': 'A'},
+]
+
+
+class IterablesTest(EtreeMixin, unittest.TestCase):
+    def setUp(self):
+        self.path = path.join(path.dirname(__file__), 'test_merge_table_rows.docx')
+
+    def merged_tree(self, rows, **kwargs):
+        with MailMerge(self.path, **kwargs) as document:
+            document.merge(student_name='Bouke Haarsma', class_code=rows)
+            with tempfile.TemporaryFile() as outfile:
+                document.write(outfile)
+            return get_document_body_part(document).getroot()
+
+    def test_rows(self):
+        expected_tree = self.merged_tree(list(ROWS))
+
+        self.assert_equal_tree(expected_tree, self.merged_tree(tuple(ROWS)))
+        self.assert_equal_tree(expected_tree, self.merged_tree(row for row in ROWS))
+        self.assert_equal_tree(expected_tree, self.merged_tree(iter(ROWS)))
+
+    def test_rows_are_consumed_lazily(self):
+        consumed = []
+
+        def rows():
+            for row in ROWS:
+                consumed.append(row)
+                # only the current row has been taken from the generator
+                self.assertEqual(len(consumed), ROWS.index(row) + 1)
+                yield row
+
+        with MailMerge(self.path) as document:
+            document.merge_rows('class_code', rows())
+            self.assertNotIn('class_code', document.get_merge_fields())
+        self.assertEqual(consumed, ROWS)
+
+    def test_empty_generator(self):
+        expected_tree = self.merged_tree([], remove_empty_tables=True)
+        self.assert_equal_tree(expected_tree, self.merged_tree(iter([]), remove_empty_tables=True))
+
+        expected_tree = self.merged_tree([])
+        self.assert_equal_tree(expected_tree, self.merged_tree(iter([])))
+
+    def test_templates(self):
+        docx = path.join(path.dirname(__file__), 'test_merge_templates_simple.docx')
+        replacements = [{'fieldname': 'one'}, {'fieldname': 'two'}, {'fieldname': 'three'}]
+
+        with MailMerge(docx) as document:
+            document.merge_templates(replacements, 'nextPage_section')
+            expected_tree = get_document_body_part(document).getroot()
+
+        with MailMerge(docx) as document:
+            document.merge_templates((r for r in replacements), 'nextPage_section')
+            self.assert_equal_tree(expected_tree, get_document_body_part(document).getroot())
@@ -0,0 +1,78 @@
+import json
+import unittest
+from io import BytesIO
+from os import path
+
+from mailmerge import MailMerge, MergeStats
+
+ROWS = [
+    {'class_code': 'ECON101', 'class_name': 'Economics 101', 'class_grade': 'A'},
+    {'class_code': 'OPRES', 'class_name': 'Operations Research', 'class_grade': 'A'},
+]
+
+
+class MergeStatsTest(unittest.TestCase):
+    def setUp(self):
+        self.path = path.join(path.dirname(__file__), 'test_merge_table_rows.docx')
+        self.stats = MergeStats()
+        self.document = MailMerge(self.path, stats=self.stats)
+
+    def tearDown(self):
+        self.document.close()
+
+    def test_disabled(self):
+        with MailMerge(self.path) as document:
+            self.assertIsNone(document.stats)
+            document.merge(student_name='Bouke Haarsma', class_code=ROWS)
+            document.write(BytesIO())
+
+    def test_merge_and_write(self):
+        self.document.merge(student_name='Bouke Haarsma', thesis_grade='A', class_code=ROWS)
+        self.document.write(BytesIO())
+
+        # 2 fields, 3 in every row and study_name, which is written empty
+        self.assertEqual(self.stats.fields_merged, 9)
+        self.assertEqual(self.stats.elements_cloned, 2)
+        # the document and the settings
+        self.assertEqual(self.stats.parts_serialized, 2)
+        info = self.document.zip.getinfo('word/document.xml')
+        self.assertEqual(self.stats.bytes_in, info.file_size)
+        self.assertGreater(self.stats.bytes_out, 0)
+
+        for phase in ('open', 'parse', 'convert_fields', 'merge', 'merge_rows', 'write', 'serialize', 'compress',
+                      'copy'):
+            self.assertIn(phase, self.stats.times)
+        self.assertEqual(set(self.stats.part_times['word/document.xml']),
+                         {'parse', 'convert_fields', 'serialize', 'compress'})
+        self.assertEqual(self.stats.times['parse'], self.stats.part_times['word/document.xml']['parse'])
+        # merge_rows is part of merge
+        self.assertLessEqual(self.stats.times['merge_rows'], self.stats.times['merge'])
+
+        json.dumps(self.stats.as_dict())
+
+    def test_merge_templates(self):
+        self.document.merge_templates([{'student_name': 'One'}, {'student_name': 'Two'}], separator='page_break')
+        self.assertEqual(self.stats.fields_merged, 2)
+        self.assertGreater(self.stats.elements_cloned, 2)
+        self.assertIn('merge_templates', self.stats.times)
+
+    def test_nested_phases(self):
+        with self.stats.timer('merge_rows'):
+            with self.stats.timer('merge_rows'):
+                pass
+        with self.stats.timer('serialize', 'word/document.xml'):
+            pass
+        self.assertEqual(sorted(self.stats.times), ['merge_rows', 'open', 'serialize'])
+        self.assertEqual(list(self.stats.part_times), ['word/document.xml'])
+
+    def test_add_time(self):
+        calls = []
+
+        class Recorder(MergeStats):
+            def add_time(self, phase, seconds, part=None):
+                calls.append((phase, part))
+
+        with MailMerge(self.path, stats=Recorder()) as document:
+            document.get_merge_fields()
+        self.assertEqual(calls, [('open', None), ('parse', 'word/document.xml'),
+                                 ('convert_fields', 'word/document.xml')])
@@ -0,0 +1,68 @@
+import unittest
+import tempfile
+from os import path
+
+from mailmerge import MailMerge, NAMESPACES
+from tests.utils import get_document_body_part
+
+
+class MergeTableNestedTest(unittest.TestCase):
+    def setUp(self):
+        self.document = MailMerge(path.join(path.dirname(__file__), 'test_merge_table_nested.docx'))
+
+    def tearDown(self):
+        self.document.close()
+
+    @staticmethod
+    def cell_texts(document):
+        """
+        The text of every cell of the outer table, with the rows of the inner
+        table joined by commas.
+        """
+        body = get_document_body_part(document).getroot().find('{%(w)s}body' % NAMESPACES)
+        table = body.find('{%(w)s}tbl' % NAMESPACES)
+        rows = []
+        for row in table.findall('{%(w)s}tr' % NAMESPACES):
+            cells = []
+            for cell in row.findall('{%(w)s}tc' % NAMESPACES):
+                inner = cell.find('{%(w)s}tbl' % NAMESPACES)
+                if inner is None:
+                    cells.append(''.join(cell.itertext()))
+                else:
+                    cells.append(','.join(''.join(r.itertext()) for r in inner.findall('{%(w)s}tr' % NAMESPACES)))
+            rows.append(cells)
+        return rows
+
+    def test_merge_nested_rows(self):
+        self.document.merge(outer=[
+            {'outer': 'o1', 'inner': [{'inner': 'a'}, {'inner': 'b'}]},
+            {'outer': 'o2', 'inner': [{'inner': 'c'}]},
+        ])
+
+        with tempfile.TemporaryFile() as outfile:
+            self.document.write(outfile)
+            with MailMerge(outfile) as written:
+                self.assertEqual(self.cell_texts(written), [
+                    ['Outer', 'Inner'],
+                    ['o1', 'a,b'],
+                    ['o2', 'c'],
+                ])
+                self.assertEqual(written.get_merge_fields(), set())
+
+    def test_merge_nested_rows_partly(self):
+        # a row without data for the inner table keeps its field
+        self.document.merge_rows('outer', [
+            {'outer': 'o1', 'inner': [{'inner': 'a'}]},
+            {'outer': 'o2'},
+        ])
+
+        self.assertEqual(self.cell_texts(self.document), [
+            ['Outer', 'Inner'],
+            ['o1', 'a'],
+            ['o2', ''],
+        ])
+        self.assertEqual(self.document.get_merge_fields(), {'inner'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,11 @@
 import unittest
 import tempfile
+from copy import deepcopy
 from os import path
 from lxml import etree
 
 from mailmerge import MailMerge, NAMESPACES
-from tests.utils import EtreeMixin
+from tests.utils import EtreeMixin, get_document_body_part
 
 
 class MergeTableRowsTest(EtreeMixin, unittest.TestCase):
@@ -30,9 +31,8 @@ class MergeTableRowsTest(EtreeMixin, unittest.TestCase):
 
         with tempfile.TemporaryFile() as outfile:
             self.document.write(outfile)
-
-        self.assert_equal_tree(self.expected_tree,
-                               list(self.document.parts.values())[0].getroot())
+            with MailMerge(outfile) as written:
+                self.assert_equal_tree(self.expected_tree, get_document_body_part(written).getroot())
 
     def test_merge_rows_no_table(self):
         """
@@ -55,9 +55,8 @@ class MergeTableRowsTest(EtreeMixin, unittest.TestCase):
 
         with tempfile.TemporaryFile() as outfile:
             self.document.write(outfile)
-
-        self.assert_equal_tree(self.expected_tree,
-                               list(self.document.parts.values())[0].getroot())
+            with MailMerge(outfile) as written:
+                self.assert_equal_tree(self.expected_tree, get_document_body_part(written).getroot())
 
     def test_merge_rows_remove_table(self):
         """
@@ -77,6 +76,23 @@ class MergeTableRowsTest(EtreeMixin, unittest.TestCase):
             list(self.document.parts.values())[0].getroot().find('.//{%(w)s}tbl' % NAMESPACES)
         )
 
+    def test_merge_rows_detached(self):
+        """
+        Rows are looked for in the given elements, which don't have to be
+        part of the document
+        """
+        body = deepcopy(get_document_body_part(self.document).getroot()[0])
+        self.document.merge_rows('class_code', [
+            {'class_code': 'ECON101', 'class_name': 'Economics 101', 'class_grade': 'A'},
+            {'class_code': 'OPRES', 'class_name': 'Operations Research', 'class_grade': 'A'},
+        ], parts=[body])
+
+        codes = [t.text for t in body.iter('{%(w)s}t' % NAMESPACES) if t.text in ('ECON101', 'OPRES')]
+        self.assertEqual(codes, ['ECON101', 'OPRES'])
+        self.assertEqual(self.document.get_merge_fields([body]), {'student_name', 'study_name', 'thesis_grade'})
+        # the document itself is left alone
+        self.assertIn('class_code', self.document.get_merge_fields())
+
     def test_merge_unified(self):
         self.document.merge(
             student_name='Bouke Haarsma',
@@ -91,9 +107,8 @@ class MergeTableRowsTest(EtreeMixin, unittest.TestCase):
 
         with tempfile.TemporaryFile() as outfile:
             self.document.write(outfile)
-
-        self.assert_equal_tree(self.expected_tree,
-                               list(self.document.parts.values())[0].getroot())
+            with MailMerge(outfile) as written:
+                self.assert_equal_tree(self.expected_tree, get_document_body_part(written).getroot())
 
     def tearDown(self):
         self.document.close()
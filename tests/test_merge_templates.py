@@ -3,7 +3,7 @@ import tempfile
 from os import path
 from lxml import etree
 
-from mailmerge import MailMerge
+from mailmerge import MailMerge, NAMESPACES
 from tests.utils import EtreeMixin, get_document_body_part
 
 
@@ -145,3 +145,25 @@ class MergeListTest(EtreeMixin, unittest.TestCase):
 
         self.assert_equal_tree(expected_tree, get_document_body_part(document).getroot())
 
+    def test_rows(self):
+        with MailMerge(path.join(path.dirname(__file__), 'test_merge_table_rows.docx')) as document:
+            document.merge_templates([
+                {'student_name': 'One', 'class_code': [{'class_code': 'Row0'}, {'class_code': 'Row1'}]},
+                {'student_name': 'Two', 'class_code': [{'class_code': 'Row0'}]},
+            ], 'page_break')
+
+            texts = [t.text for t in get_document_body_part(document).getroot().iter('{%(w)s}t' % NAMESPACES)]
+            self.assertEqual([text for text in texts if text in ('One', 'Two', 'Row0', 'Row1')],
+                             ['One', 'Row0', 'Row1', 'Two', 'Row0'])
+            # the row fields without a value are left, as with merge_rows
+            self.assertEqual(document.get_merge_fields(), {'study_name', 'thesis_grade', 'class_name', 'class_grade'})
+
+    def test_remove_empty_tables(self):
+        with MailMerge(path.join(path.dirname(__file__), 'test_merge_table_rows.docx'), True) as document:
+            document.merge_templates([
+                {'student_name': 'One', 'class_code': [{'class_code': 'Row0'}]},
+                {'student_name': 'Two', 'class_code': []},
+            ], 'page_break')
+
+            body = get_document_body_part(document).getroot()
+            self.assertEqual(len(body.findall('.//{%(w)s}tbl' % NAMESPACES)), 1)
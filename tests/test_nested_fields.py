@@ -0,0 +1,38 @@
+import unittest
+import tempfile
+from os import path
+from lxml import etree
+
+from mailmerge import MailMerge
+from tests.utils import EtreeMixin, get_document_body_part
+
+
+class NestedFieldsTest(EtreeMixin, unittest.TestCase):
+    def test(self):
+        with MailMerge(path.join(path.dirname(__file__), 'test_nested_fields.docx')) as document:
+            self.assertEqual(document.get_merge_fields(), {'first_name', 'gender', 'last_name'})
+
+            document.merge(first_name='Jane', gender='f', last_name='Doe')
+
+            with tempfile.TemporaryFile() as outfile:
+                document.write(outfile)
+
+        expected_tree = etree.fromstring(
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+            '<w:body><w:p>'
+            '<w:r><w:t xml:space="preserve">Dear </w:t></w:r>'
+            '<w:r><w:t>Jane</w:t></w:r>'
+            '<w:r><w:t xml:space="preserve">, you are </w:t></w:r>'
+            '<w:r><w:fldChar w:fldCharType="begin"/></w:r>'
+            '<w:r><w:instrText xml:space="preserve"> IF </w:instrText></w:r>'
+            '<w:r><w:t>f</w:t></w:r>'
+            '<w:r><w:instrText xml:space="preserve"> = "f" "Ms" "Mr" </w:instrText></w:r>'
+            '<w:r><w:fldChar w:fldCharType="separate"/></w:r>'
+            '<w:r><w:t xml:space="preserve">Mr</w:t></w:r>'
+            '<w:r><w:fldChar w:fldCharType="end"/></w:r>'
+            '<w:r><w:t xml:space="preserve"> </w:t></w:r>'
+            '<w:r><w:t>Doe</w:t></w:r>'
+            '<w:r><w:t xml:space="preserve">.</w:t></w:r>'
+            '</w:p><w:sectPr/></w:body></w:document>')
+
+        self.assert_equal_tree(expected_tree, get_document_body_part(document).getroot())
@@ -0,0 +1,87 @@
+import unittest
+import tempfile
+from io import BytesIO
+from os import path
+from zipfile import ZipFile
+
+from lxml import etree
+
+from mailmerge import MailMerge, CompiledTemplate, NAMESPACES, _may_have_fields
+
+
+class PassthroughPartsTest(unittest.TestCase):
+    def setUp(self):
+        self.path = path.join(path.dirname(__file__), 'test_passthrough_parts.docx')
+        self.document = MailMerge(self.path)
+        self.header = self.document.zip.getinfo('word/header1.xml')
+        self.footer = self.document.zip.getinfo('word/footer1.xml')
+
+    def tearDown(self):
+        self.document.close()
+
+    def written(self, document):
+        output = BytesIO()
+        document.write(output)
+        return ZipFile(output)
+
+    def test_parts_are_parsed_when_needed(self):
+        self.assertEqual(len(self.document.parts), 3)
+        self.assertFalse(any(self.document.parts.is_loaded(zi) for zi in self.document.parts))
+
+        self.assertEqual(self.document.get_merge_fields(), {'fieldname', 'header_field'})
+        self.assertTrue(self.document.parts.is_loaded(self.header))
+        self.assertFalse(self.document.parts.is_loaded(self.footer))
+
+    def test_merge(self):
+        self.document.merge(fieldname='one', header_field='two')
+        with self.written(self.document) as output:
+            header = output.read('word/header1.xml')
+            self.assertIn(b'<w:t>two</w:t>', header)
+            self.assertNotIn(b'MERGEFIELD', header)
+
+            # the footer without fields is copied as-is
+            with ZipFile(self.path) as source:
+                self.assertEqual(output.read('word/footer1.xml'), source.read('word/footer1.xml'))
+                self.assertEqual(output.getinfo('word/footer1.xml').compress_size,
+                                 source.getinfo('word/footer1.xml').compress_size)
+        self.assertFalse(self.document.parts.is_loaded(self.footer))
+
+    def test_changed_passthrough_part(self):
+        footer = self.document.parts[self.footer]
+        footer.getroot().find('.//{%(w)s}t' % NAMESPACES).text = 'Changed footer'
+        with self.written(self.document) as output:
+            self.assertIn(b'Changed footer', output.read('word/footer1.xml'))
+
+    def test_compiled_template(self):
+        template = CompiledTemplate(self.path)
+        self.assertEqual(template.passthrough_parts, ['word/footer1.xml'])
+        self.assertEqual(sorted(fn for fn, part in template.parts), ['word/document.xml', 'word/header1.xml'])
+
+        with MailMerge(template) as document:
+            self.assertEqual(len(document.parts), 3)
+            document.merge(fieldname='one', header_field='two')
+            expected = self.written(document)
+
+        with tempfile.TemporaryFile() as outfile:
+            template.render(outfile, fieldname='one', header_field='two')
+            with ZipFile(outfile) as output:
+                for name in ('word/document.xml', 'word/header1.xml', 'word/footer1.xml'):
+                    self.assertEqual(output.read(name), expected.read(name))
+        expected.close()
+
+    def test_may_have_fields(self):
+        header = self.document.zip.read(self.header)
+        footer = self.document.zip.read(self.footer)
+        for chunk_size in (1, 7, 64, 1 << 16):
+            self.assertTrue(_may_have_fields(BytesIO(header), chunk_size))
+            self.assertFalse(_may_have_fields(BytesIO(footer), chunk_size))
+
+        simple = etree.tostring(etree.fromstring(
+            '<w:p xmlns:w="%(w)s"><w:fldSimple w:instr=" MERGEFIELD name "/></w:p>' % NAMESPACES))
+        self.assertTrue(_may_have_fields(BytesIO(simple), 5))
+        page = header.replace(b' MERGE', b' PAGE').replace(b'FIELD header_field', b'')
+        self.assertFalse(_may_have_fields(BytesIO(page), 5))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+import tempfile
+from os import path
+from zipfile import ZipFile
+
+from mailmerge import MailMerge, _read_raw, _write_raw
+
+
+class RawCopyTest(unittest.TestCase):
+    def setUp(self):
+        self.path = path.join(path.dirname(__file__), 'test_winword2010.docx')
+
+    def test_unchanged_members_are_copied(self):
+        with MailMerge(self.path) as document, tempfile.TemporaryFile() as outfile:
+            document.write(outfile)
+
+            with ZipFile(self.path) as source, ZipFile(outfile) as output:
+                self.assertIsNone(output.testzip())
+                self.assertEqual(source.namelist(), output.namelist())
+                for zi in source.infolist():
+                    if zi.filename in ('word/document.xml', 'word/settings.xml') or \
+                            zi.filename.startswith(('word/header', 'word/footer')):
+                        continue
+                    out = output.getinfo(zi.filename)
+                    self.assertEqual((zi.CRC, zi.compress_size, zi.compress_type),
+                                     (out.CRC, out.compress_size, out.compress_type))
+                    self.assertEqual(source.read(zi), output.read(out))
+
+    def test_fallback_without_zipfile_internals(self):
+        class PlainZipFile(object):
+            # only the documented interface of ZipFile
+            def __init__(self, zip):
+                self.writestr = zip.writestr
+
+        with ZipFile(self.path) as source, tempfile.TemporaryFile() as outfile:
+            with ZipFile(outfile, 'w') as output:
+                for zi in source.infolist():
+                    _write_raw(PlainZipFile(output), zi, _read_raw(source, zi))
+
+            with ZipFile(outfile) as output:
+                self.assertIsNone(output.testzip())
+                for zi in source.infolist():
+                    out = output.getinfo(zi.filename)
+                    self.assertEqual(zi.compress_type, out.compress_type)
+                    self.assertEqual(source.read(zi), output.read(out))
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+import unittest
+from io import BytesIO
+from os import path
+from zipfile import ZipFile
+
+from mailmerge import MailMerge, CompiledTemplate
+
+
+class RenderTest(unittest.TestCase):
+    def assert_same_as_merge(self, filename, **replacements):
+        template = CompiledTemplate(path.join(path.dirname(__file__), filename))
+
+        expected = BytesIO()
+        with MailMerge(template) as document:
+            document.merge(**replacements)
+            document.write(expected)
+
+        rendered = BytesIO()
+        template.render(rendered, **replacements)
+
+        with ZipFile(expected) as lhs, ZipFile(rendered) as rhs:
+            self.assertEqual(lhs.namelist(), rhs.namelist())
+            self.assertIsNone(rhs.testzip())
+            for name in lhs.namelist():
+                self.assertEqual(lhs.read(name), rhs.read(name), name)
+
+    def test_values(self):
+        self.assert_same_as_merge(
+            'test_winword2010.docx',
+            Titel='Dhr.', Voornaam=u'Bouké & <Co> "x"', Achternaam='Haarsma\nHelperpark\r\n278d',
+            Adresregel_1='\n', Postcode=9723, Plaats=None, Land=u'\U0001F600')
+
+        # characters XML can't hold fail like they do for merge
+        template = CompiledTemplate(path.join(path.dirname(__file__), 'test_winword2010.docx'))
+        for value in (u'\ufffe', u'\uffff', u'\ud800', u'a\udfffb'):
+            with MailMerge(template) as document:
+                with self.assertRaises(ValueError):
+                    document.merge(Voornaam=value)
+                    document.write(BytesIO())
+            with self.assertRaises(ValueError):
+                template.render(BytesIO(), Voornaam=value)
+
+    def test_headers_and_footers(self):
+        self.assert_same_as_merge('test_merge_table_multipart.docx', student_name='Bouke', thesis_grade='A')
+
+    def test_rows_fall_back(self):
+        self.assert_same_as_merge(
+            'test_merge_table_rows.docx',
+            student_name='Bouke Haarsma',
+            class_code=[
+                {'class_code': 'ECON101', 'class_name': 'Economics 101', 'class_grade': 'A'},
+                {'class_code': 'OPRES', 'class_name': 'Operations Research', 'class_grade': 'A'},
+            ])
+
+    def test_invalid_characters(self):
+        template = CompiledTemplate(path.join(path.dirname(__file__), 'test_issue8.docx'))
+        with self.assertRaises(ValueError):
+            template.render(BytesIO(), testfield='\x00')
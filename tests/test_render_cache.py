@@ -0,0 +1,101 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from decimal import Decimal
+from io import BytesIO
+from os import path
+
+from mailmerge import CompiledTemplate, MailMerge, RenderCache
+
+TEMPLATE = path.join(path.dirname(__file__), 'test_merge_table_rows.docx')
+ROWS = [
+    {'class_code': 'ECON101', 'class_name': 'Economics 101', 'class_grade': 'A'},
+    {'class_code': 'OPRES', 'class_name': 'Operations Research', 'class_grade': 'B'},
+]
+
+
+class RenderCacheTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.template = CompiledTemplate(TEMPLATE)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = RenderCache(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def rendered(self, **replacements):
+        output = BytesIO()
+        self.template.render(output, **replacements)
+        return output.getvalue()
+
+    def test_deterministic(self):
+        first = self.rendered(student_name='Alice', class_code=ROWS)
+        with MailMerge(TEMPLATE) as document:
+            document.merge(student_name='Alice', class_code=ROWS)
+            output = BytesIO()
+            # members written later still get the timestamps of the template
+            time.sleep(2)
+            document.write(output)
+        self.assertEqual(output.getvalue(), first)
+        self.assertEqual(self.rendered(student_name='Alice'), self.rendered(student_name='Alice'))
+
+    def test_hit(self):
+        data = self.cache.get(self.template, student_name='Alice', class_code=ROWS)
+        self.assertEqual(data, self.rendered(student_name='Alice', class_code=ROWS))
+        self.assertEqual(self.cache.get(self.template, class_code=ROWS, student_name='Alice'), data)
+        self.assertEqual((self.cache.hits, self.cache.misses, len(self.cache)), (1, 1, 1))
+        self.assertEqual(self.cache.size, len(data))
+
+        output = BytesIO()
+        self.cache.render(self.template, output, student_name='Alice', class_code=ROWS)
+        self.assertEqual(output.getvalue(), data)
+        filename = path.join(self.directory, 'output.docx')
+        self.cache.render(self.template, filename, student_name='Alice', class_code=ROWS)
+        with open(filename, 'rb') as fp:
+            self.assertEqual(fp.read(), data)
+        self.assertEqual(self.cache.hits, 3)
+
+    def test_key(self):
+        key = RenderCache.key(self.template, {'student_name': 'Alice', 'class_code': ROWS})
+        self.assertEqual(RenderCache.key(self.template, {'class_code': ROWS, 'student_name': 'Alice'}), key)
+        self.assertNotEqual(RenderCache.key(self.template, {'student_name': 'Alice', 'class_code': ROWS[:1]}), key)
+        self.assertNotEqual(RenderCache.key(self.template, {'student_name': 'Bob', 'class_code': ROWS}), key)
+        other = CompiledTemplate(path.join(path.dirname(__file__), 'test_merge_pages.docx'))
+        self.assertNotEqual(RenderCache.key(other, {'student_name': 'Alice', 'class_code': ROWS}), key)
+
+    def test_eviction(self):
+        size = len(self.cache.get(self.template, student_name='Alice'))
+        first = self.cache.path(self.template, student_name='Alice')
+        os.utime(first, (0, 0))
+        self.cache.max_bytes = size * 2 + size // 2
+        self.cache.get(self.template, student_name='Bob')
+        self.cache.get(self.template, student_name='Carol')
+
+        self.assertEqual(self.cache.evictions, 1)
+        self.assertEqual(len(self.cache), 2)
+        self.assertFalse(path.exists(first))
+        self.assertLessEqual(self.cache.size, self.cache.max_bytes)
+        # existing documents are counted when the cache is opened again
+        self.assertEqual(RenderCache(self.directory).size, self.cache.size)
+
+        self.cache.clear()
+        self.assertEqual((len(self.cache), self.cache.size), (0, 0))
+
+    def test_merged_values(self):
+        # values are hashed as the text they are merged as
+        self.assertEqual(self.cache.get(self.template, student_name=Decimal('0')), self.rendered(student_name=''))
+        self.assertEqual(RenderCache.key(self.template, {'student_name': Decimal('1.5')}),
+                         RenderCache.key(self.template, {'student_name': '1.5'}))
+        self.assertNotEqual(RenderCache.key(self.template, {'student_name': 0}),
+                            RenderCache.key(self.template, {'student_name': '0'}))
+
+        # rows can be generators, which are only consumed once
+        data = self.cache.get(self.template, class_code=(row for row in ROWS))
+        self.assertEqual(data, self.rendered(class_code=ROWS))
+        self.assertEqual(self.cache.get(self.template, class_code=iter(ROWS)), data)
+        self.assertEqual((self.cache.hits, len(self.cache)), (1, 2))
@@ -0,0 +1,82 @@
+import os
+import pickle
+import shutil
+import tempfile
+import time
+import unittest
+from io import BytesIO
+from os import path
+
+from mailmerge import MailMerge, CompiledTemplate
+from tests.utils import document_xml
+
+TEMPLATE = path.join(path.dirname(__file__), 'test_issue8.docx')
+OUTPUT_DIR = tempfile.gettempdir()
+
+
+def output_in_dir(index, record):
+    return path.join(OUTPUT_DIR, 'render-many-%d.docx' % index)
+
+
+class RenderManyTest(unittest.TestCase):
+    records = [{'testfield': 'record %d' % i} for i in range(10)]
+
+    def expected(self, record):
+        output = BytesIO()
+        CompiledTemplate(TEMPLATE).render(output, **record)
+        return document_xml(output.getvalue())
+
+    def test_bytes(self):
+        for workers in (1, 2):
+            results = list(MailMerge.render_many(TEMPLATE, self.records, workers=workers))
+            self.assertEqual([index for index, _, _ in results], list(range(10)))
+            for (index, docx, error), record in zip(results, self.records):
+                self.assertIsNone(error)
+                self.assertEqual(document_xml(docx), self.expected(record))
+
+    def test_unordered(self):
+        results = MailMerge.render_many(CompiledTemplate(TEMPLATE), iter(self.records), workers=2, ordered=False)
+        self.assertEqual(sorted(index for index, _, _ in results), list(range(10)))
+
+    def test_bounded_read_ahead(self):
+        read = []
+
+        def records():
+            for i in range(1000):
+                read.append(i)
+                yield {'testfield': 'record %d' % i}
+
+        for ordered in (True, False):
+            del read[:]
+            results = MailMerge.render_many(TEMPLATE, records(), workers=2, ordered=ordered, chunksize=4)
+            next(results)
+            time.sleep(0.5)
+            # two shards per worker, and the one submitted for the result
+            self.assertLessEqual(len(read), 2 * 2 * 4 + 4)
+            results.close()
+
+    def test_output_factory(self):
+        global OUTPUT_DIR
+        OUTPUT_DIR = tempfile.mkdtemp()
+        try:
+            results = list(MailMerge.render_many(TEMPLATE, self.records, output_in_dir, workers=2))
+            for (index, filename, error), record in zip(results, self.records):
+                self.assertIsNone(error)
+                self.assertEqual(filename, output_in_dir(index, record))
+                self.assertEqual(document_xml(filename), self.expected(record))
+            self.assertEqual(len(os.listdir(OUTPUT_DIR)), 10)
+        finally:
+            shutil.rmtree(OUTPUT_DIR)
+
+    def test_errors(self):
+        records = [{'testfield': 'ok'}, {'testfield': 'not \x00 ok'}, {'testfield': 'ok'}]
+        for workers in (1, 2):
+            results = list(MailMerge.render_many(TEMPLATE, records, workers=workers))
+            self.assertEqual([error is None for _, _, error in results], [True, False, True])
+            self.assertIsInstance(results[1][2], ValueError)
+
+    def test_pickle_template(self):
+        template = pickle.loads(pickle.dumps(CompiledTemplate(TEMPLATE)))
+        output = BytesIO()
+        template.render(output, testfield='pickled')
+        self.assertEqual(document_xml(output.getvalue()), self.expected({'testfield': 'pickled'}))
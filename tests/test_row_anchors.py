@@ -0,0 +1,74 @@
+import unittest
+from os import path
+
+from mailmerge import MailMerge, NAMESPACES
+from tests.utils import get_document_body_part
+
+
+class RowAnchorsTest(unittest.TestCase):
+    def setUp(self):
+        self.path = path.join(path.dirname(__file__), 'test_merge_table_rows.docx')
+
+    def table_texts(self, document):
+        """
+        The text of every cell, or the name of the field in it, per row of
+        every table in the document body.
+        """
+        tables = []
+        for table in get_document_body_part(document).getroot().iter('{%(w)s}tbl' % NAMESPACES):
+            rows = []
+            for row in table.iter('{%(w)s}tr' % NAMESPACES):
+                cells = []
+                for cell in row.iter('{%(w)s}tc' % NAMESPACES):
+                    mf = next(cell.iter('MergeField'), None)
+                    if mf is not None:
+                        cells.append('[%s]' % mf.get('name'))
+                    else:
+                        cells.append(''.join(cell.itertext()))
+                rows.append(cells)
+            tables.append(rows)
+        return tables
+
+    def test_anchor_in_copied_rows(self):
+        with MailMerge(self.path) as document:
+            document.merge_rows('class_code', [{'class_code': 'ECON101'}, {'class_code': 'OPRES'}])
+            # the fields left in the copies are anchors of their own
+            document.merge_rows('class_name', [{'class_name': 'Economics 101'}, {'class_name': 'Economics'}])
+            document.merge_rows('class_name', [{'class_name': 'Operations Research', 'class_grade': 'A'}])
+
+            self.assertEqual(self.table_texts(document)[0][1:5], [
+                ['ECON101', 'Economics 101', '[class_grade]'],
+                ['ECON101', 'Economics', '[class_grade]'],
+                ['OPRES', 'Operations Research', 'A'],
+                ['THESIS', 'Final thesis', '[thesis_grade]'],
+            ])
+
+    def test_merged_anchor(self):
+        with MailMerge(self.path) as document:
+            document.merge(class_code='ECON101')
+            document.merge_rows('class_code', [{'class_code': 'OPRES'}])
+            self.assertEqual(self.table_texts(document)[0][1], ['ECON101', '[class_name]', '[class_grade]'])
+
+    def test_removed_table(self):
+        with MailMerge(self.path, remove_empty_tables=True) as document:
+            document.merge_rows('class_code', [])
+            document.merge_rows('class_code', [{'class_code': 'ECON101'}])
+            document.merge_rows('thesis_grade', [{'thesis_grade': 'A'}])
+            self.assertEqual(self.table_texts(document), [])
+
+    def test_copied_tables(self):
+        with MailMerge(self.path) as document:
+            document.merge_templates([{}, {}], separator='page_break')
+            # every call takes the first table that still has the anchor
+            document.merge_rows('class_code', [{'class_code': 'ECON101'}])
+            document.merge(class_code=[{'class_code': 'OPRES'}, {'class_code': 'ECONADV'}],
+                           thesis_grade=[{'thesis_grade': 'A'}])
+
+            codes = [[row[0] for row in table[1:-1]] for table in self.table_texts(document)]
+            self.assertEqual(codes, [['ECON101'], ['OPRES', 'ECONADV']])
+            self.assertEqual(self.table_texts(document)[1][-1][-1], '[thesis_grade]')
+            self.assertEqual(self.table_texts(document)[0][-1][-1], 'A')
+
+
+if __name__ == '__main__':
+    unittest.main()
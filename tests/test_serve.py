@@ -0,0 +1,69 @@
+import json
+import threading
+import unittest
+from os import path
+
+try:
+    from http.client import HTTPConnection
+except ImportError:  # Python 2
+    from httplib import HTTPConnection
+
+from mailmerge_cli import RenderService, RenderServer
+from tests.utils import document_xml
+
+TEMPLATE = path.join(path.dirname(__file__), 'test_merge_table_rows.docx')
+
+
+class RenderServiceTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.service = RenderService({'letter': TEMPLATE}, workers=1)
+        cls.server = RenderServer(('127.0.0.1', 0), cls.service, quiet=True)
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.thread.join()
+        cls.server.server_close()
+        cls.service.close()
+
+    def request(self, method, url, body=None):
+        connection = HTTPConnection(*self.server.server_address[:2])
+        try:
+            connection.request(method, url, body)
+            response = connection.getresponse()
+            return response.status, response.getheader('Content-Type'), response.read()
+        finally:
+            connection.close()
+
+    def test_render(self):
+        xml = document_xml(self.service.render('letter', {'student_name': 'Alice'}))
+        self.assertIn(b'<w:t>Alice</w:t>', xml)
+        self.assertRaises(KeyError, self.service.render, 'missing', {})
+
+    def test_render_request(self):
+        record = {'student_name': 'Bob', 'class_code': [{'class_code': 'ECON101'}, {'class_code': 'OPRES'}]}
+        status, content_type, data = self.request('POST', '/render/letter', json.dumps(record).encode('utf-8'))
+        self.assertEqual(status, 200)
+        self.assertEqual(content_type, 'application/vnd.openxmlformats-officedocument.wordprocessingml.document')
+        xml = document_xml(data)
+        self.assertIn(b'<w:t>Bob</w:t>', xml)
+        self.assertIn(b'<w:t>OPRES</w:t>', xml)
+
+    def test_bad_requests(self):
+        self.assertEqual(self.request('POST', '/render/letter', b'{"student_name"')[0], 400)
+        self.assertEqual(self.request('POST', '/render/letter', b'[]')[0], 400)
+        self.assertEqual(self.request('POST', '/render/missing', b'{}')[0], 404)
+        self.assertEqual(self.request('GET', '/missing')[0], 404)
+
+    def test_health_and_stats(self):
+        status, content_type, data = self.request('GET', '/health')
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(data.decode('utf-8')), {'status': 'ok', 'templates': ['letter'], 'workers': 1})
+
+        self.request('POST', '/render/letter', b'{}')
+        stats = json.loads(self.request('GET', '/stats')[2].decode('utf-8'))
+        self.assertGreaterEqual(stats['requests'], 1)
+        self.assertGreaterEqual(stats['templates']['letter']['documents'], 1)
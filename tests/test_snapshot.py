@@ -0,0 +1,96 @@
+import unittest
+from io import BytesIO
+from os import path
+from zipfile import ZipFile
+
+from mailmerge import MailMerge, NAMESPACES
+
+ROWS = [
+    {'class_code': 'ECON101', 'class_name': 'Economics 101', 'class_grade': 'A'},
+    {'class_code': 'OPRES', 'class_name': 'Operations Research', 'class_grade': 'A'},
+]
+
+
+def written(document):
+    output = BytesIO()
+    document.write(output)
+    with ZipFile(output) as docx:
+        return dict((name, docx.read(name)) for name in docx.namelist())
+
+
+class WriteTwiceTest(unittest.TestCase):
+    def setUp(self):
+        self.path = path.join(path.dirname(__file__), 'test_merge_table_rows.docx')
+        self.document = MailMerge(self.path)
+
+    def tearDown(self):
+        self.document.close()
+
+    def test_write_keeps_fields(self):
+        fields = self.document.get_merge_fields()
+        first = written(self.document)
+        self.assertEqual(self.document.get_merge_fields(), fields)
+        self.assertEqual(written(self.document), first)
+
+    def test_preview_then_final(self):
+        self.document.merge(student_name='Bouke Haarsma')
+        preview = written(self.document)
+        self.document.merge(study_name='Industrial Engineering and Management', class_code=ROWS)
+        final = written(self.document)
+
+        self.assertNotIn(b'Industrial Engineering', preview['word/document.xml'])
+        self.assertNotIn(b'MERGEFIELD', preview['word/document.xml'])
+        self.assertIn(b'Industrial Engineering', final['word/document.xml'])
+
+        with MailMerge(self.path) as expected:
+            expected.merge(student_name='Bouke Haarsma', study_name='Industrial Engineering and Management',
+                           class_code=ROWS)
+            self.assertEqual(final, written(expected))
+
+
+class SnapshotTest(unittest.TestCase):
+    def expected(self, filename, **replacements):
+        with MailMerge(path.join(path.dirname(__file__), filename)) as document:
+            document.merge(**replacements)
+            return written(document)
+
+    def test_restore(self):
+        with MailMerge(path.join(path.dirname(__file__), 'test_merge_table_rows.docx')) as document:
+            snapshot = document.snapshot()
+            variants = [
+                {'student_name': 'Bouke Haarsma', 'class_code': ROWS},
+                {'study_name': 'Industrial Engineering and Management', 'thesis_grade': 'B'},
+                {'student_name': 'Someone Else', 'class_code': []},
+            ]
+            for replacements in variants:
+                document.restore(snapshot)
+                document.merge(**replacements)
+                self.assertEqual(written(document), self.expected('test_merge_table_rows.docx', **replacements))
+
+    def test_restore_merged_state(self):
+        with MailMerge(path.join(path.dirname(__file__), 'test_merge_table_rows.docx')) as document:
+            document.merge(student_name='Bouke Haarsma')
+            snapshot = document.snapshot()
+            document.merge(class_code=ROWS, thesis_grade='A')
+            document.restore(snapshot)
+
+            self.assertEqual(document.get_merge_fields(),
+                             {'study_name', 'class_name', 'class_code', 'class_grade', 'thesis_grade'})
+            document.merge(class_code=ROWS[:1])
+            self.assertEqual(written(document),
+                             self.expected('test_merge_table_rows.docx', student_name='Bouke Haarsma',
+                                           class_code=ROWS[:1]))
+
+    def test_restore_unparsed_parts(self):
+        with MailMerge(path.join(path.dirname(__file__), 'test_passthrough_parts.docx')) as document:
+            footer = document.zip.getinfo('word/footer1.xml')
+            snapshot = document.snapshot()
+            self.assertFalse(document.parts.is_loaded(footer))
+
+            document.merge(header_field='one')
+            document.parts[footer].getroot().find('.//{%(w)s}t' % NAMESPACES).text = 'Changed footer'
+            document.restore(snapshot)
+            self.assertFalse(document.parts.is_loaded(footer))
+
+            document.merge(fieldname='two')
+            self.assertEqual(written(document), self.expected('test_passthrough_parts.docx', fieldname='two'))
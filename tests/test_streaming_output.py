@@ -0,0 +1,90 @@
+import unittest
+from io import BytesIO
+from os import path
+from zipfile import ZipFile
+
+from mailmerge import MailMerge, CompiledTemplate
+
+
+class Unseekable(object):
+    """
+    Output that can only be written to, like a socket.
+    """
+    def __init__(self):
+        self.output = BytesIO()
+
+    def write(self, data):
+        return self.output.write(data)
+
+    def flush(self):
+        pass
+
+
+class StreamingOutputTest(unittest.TestCase):
+    def setUp(self):
+        self.path = path.join(path.dirname(__file__), 'test_merge_table_rows.docx')
+        with open(self.path, 'rb') as docx:
+            self.data = docx.read()
+
+    def assert_same_documents(self, lhs, rhs):
+        with ZipFile(BytesIO(lhs)) as lhs, ZipFile(BytesIO(rhs)) as rhs:
+            self.assertIsNone(rhs.testzip())
+            self.assertEqual(lhs.namelist(), rhs.namelist())
+            for name in lhs.namelist():
+                self.assertEqual(lhs.read(name), rhs.read(name), name)
+
+    def expected(self):
+        expected = BytesIO()
+        with MailMerge(self.path) as document:
+            document.merge(student_name='Bouke Haarsma')
+            document.write(expected)
+        return expected.getvalue()
+
+    def test_iter_write(self):
+        with MailMerge(self.path) as document:
+            document.merge(student_name='Bouke Haarsma')
+            chunks = list(document.iter_write())
+
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(chunks[0].startswith(b'PK\x03\x04'))
+        self.assert_same_documents(self.expected(), b''.join(chunks))
+
+    def test_unseekable_output(self):
+        expected = self.expected()
+        writers = [
+            lambda document, output: document.write(output),
+            lambda document, output: document.write_merged(output, student_name='Bouke Haarsma'),
+        ]
+        for write in writers:
+            output = Unseekable()
+            with MailMerge(self.path) as document:
+                document.merge(student_name='Bouke Haarsma')
+                write(document, output)
+            self.assert_same_documents(expected, output.output.getvalue())
+
+        output = Unseekable()
+        CompiledTemplate(self.path).render(output, student_name='Bouke Haarsma')
+        self.assert_same_documents(expected, output.output.getvalue())
+
+        output = Unseekable()
+        with MailMerge(self.path) as document:
+            document.write_templates(output, [{}], separator='page_break')
+        with ZipFile(BytesIO(output.output.getvalue())) as docx:
+            self.assertIsNone(docx.testzip())
+
+    def test_buffer_input(self):
+        expected = self.expected()
+        for data in (self.data, bytearray(self.data), memoryview(self.data)):
+            output = BytesIO()
+            with MailMerge(data) as document:
+                document.merge(student_name='Bouke Haarsma')
+                document.write(output)
+            self.assert_same_documents(expected, output.getvalue())
+
+            output = BytesIO()
+            CompiledTemplate(data).render(output, student_name='Bouke Haarsma')
+            self.assert_same_documents(expected, output.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
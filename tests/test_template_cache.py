@@ -0,0 +1,78 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+from io import BytesIO
+from os import path
+
+from mailmerge import TemplateCache
+
+TEMPLATE = path.join(path.dirname(__file__), 'test_merge_table_rows.docx')
+OTHER = path.join(path.dirname(__file__), 'test_merge_pages.docx')
+
+
+class TemplateCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = TemplateCache()
+
+    def test_lookup_by_path(self):
+        template = self.cache.get(TEMPLATE)
+        self.assertIs(self.cache.get(TEMPLATE), template)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_changed_file(self):
+        directory = tempfile.mkdtemp()
+        try:
+            filename = path.join(directory, 'template.docx')
+            shutil.copy(TEMPLATE, filename)
+            template = self.cache.get(filename)
+
+            shutil.copy(OTHER, filename)
+            os.utime(filename, (0, 0))
+            self.assertIsNot(self.cache.get(filename), template)
+            self.assertEqual((self.cache.hits, self.cache.misses), (0, 2))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_lookup_by_content(self):
+        with open(TEMPLATE, 'rb') as fp:
+            data = fp.read()
+        template = self.cache.get(data)
+        self.assertEqual(template.digest, hashlib.sha256(data).hexdigest())
+        self.assertIs(self.cache.get(BytesIO(data)), template)
+        self.assertIs(self.cache.get(memoryview(data)), template)
+        self.assertEqual((self.cache.hits, self.cache.misses), (2, 1))
+
+    def test_working_copies(self):
+        fields = {'student_name', 'study_name', 'class_name', 'class_code', 'class_grade', 'thesis_grade'}
+        with self.cache.open(TEMPLATE) as document:
+            document.merge(student_name='Bouke Haarsma', thesis_grade='A')
+            self.assertEqual(document.get_merge_fields(), fields - {'student_name', 'thesis_grade'})
+        with self.cache.open(TEMPLATE) as document:
+            self.assertEqual(document.get_merge_fields(), fields)
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_evict_by_entries(self):
+        cache = TemplateCache(max_entries=1)
+        cache.get(TEMPLATE)
+        cache.get(OTHER)
+        cache.get(OTHER)
+        self.assertEqual(len(cache), 1)
+        self.assertEqual((cache.hits, cache.misses, cache.evictions), (1, 2, 1))
+
+    def test_evict_by_size(self):
+        size = self.cache.get(TEMPLATE).size + self.cache.get(OTHER).size
+        self.assertEqual(self.cache.size, size)
+
+        cache = TemplateCache(max_bytes=size - 1)
+        cache.get(TEMPLATE)
+        cache.get(OTHER)
+        cache.get(TEMPLATE)
+        self.assertEqual(len(cache), 1)
+        self.assertEqual((cache.hits, cache.misses, cache.evictions), (0, 3, 2))
+
+        # templates that don't fit at all aren't cached
+        cache = TemplateCache(max_bytes=1)
+        self.assertIsNotNone(cache.get(TEMPLATE))
+        self.assertEqual((len(cache), cache.size, cache.evictions), (0, 0, 0))
@@ -0,0 +1,38 @@
+import unittest
+from io import BytesIO
+from os import path
+from zipfile import ZipFile
+
+from mailmerge import MailMerge, MergeStats
+
+
+def members(data):
+    with ZipFile(BytesIO(data)) as docx:
+        return [(zi.filename, docx.read(zi)) for zi in docx.infolist()]
+
+
+class ThreadedWriteTest(unittest.TestCase):
+    def setUp(self):
+        self.stats = MergeStats()
+        self.document = MailMerge(path.join(path.dirname(__file__), 'test_merge_pages.docx'), stats=self.stats)
+        self.document.merge(fieldname='one')
+
+    def tearDown(self):
+        self.document.close()
+
+    def written(self, threads=None):
+        output = BytesIO()
+        self.document.write(output, threads=threads)
+        return output.getvalue()
+
+    def test_same_members(self):
+        self.assertEqual(members(self.written(threads=4)), members(self.written()))
+
+    def test_deterministic(self):
+        first = self.written(threads=4)
+        self.assertEqual(self.written(threads=2), first)
+        self.assertIn('serialize', self.stats.part_times['word/document.xml'])
+        self.assertIn('compress', self.stats.part_times['word/document.xml'])
+
+    def test_iter_write(self):
+        self.assertEqual(b''.join(self.document.iter_write(threads=4)), self.written(threads=4))
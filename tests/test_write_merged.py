@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+import unittest
+from io import BytesIO
+from os import path
+from zipfile import ZipFile, ZIP_DEFLATED
+
+from mailmerge import MailMerge
+
+
+class WriteMergedTest(unittest.TestCase):
+    def assert_same_as_merge(self, file, **replacements):
+        if not hasattr(file, 'read'):
+            file = path.join(path.dirname(__file__), file)
+
+        expected = BytesIO()
+        with MailMerge(file) as document:
+            document.merge(**replacements)
+            document.write(expected)
+
+        streamed = BytesIO()
+        with MailMerge(file) as document:
+            document.write_merged(streamed, **replacements)
+
+        with ZipFile(expected) as lhs, ZipFile(streamed) as rhs:
+            self.assertEqual(lhs.namelist(), rhs.namelist())
+            self.assertIsNone(rhs.testzip())
+            for name in lhs.namelist():
+                self.assertEqual(lhs.read(name), rhs.read(name), name)
+
+    def test_values(self):
+        self.assert_same_as_merge(
+            'test_winword2010.docx',
+            Titel='Dhr.', Voornaam=u'Bouké & <Co> "x"', Achternaam='Haarsma\nHelperpark\r\n278d',
+            Adresregel_1='\n', Postcode=9723, Plaats=None, Land=u'\U0001F600')
+
+    def test_tables_headers_and_footers(self):
+        self.assert_same_as_merge('test_merge_table_multipart.docx', student_name='Bouke', thesis_grade='A')
+        self.assert_same_as_merge('test_passthrough_parts.docx', fieldname='one', header_field='two')
+
+    def test_nested_fields(self):
+        with MailMerge(path.join(path.dirname(__file__), 'test_nested_fields.docx')) as document:
+            fields = document.get_merge_fields()
+        self.assert_same_as_merge('test_nested_fields.docx', **dict((name, name.upper()) for name in fields))
+
+    def test_rows_fall_back(self):
+        self.assert_same_as_merge(
+            'test_merge_table_rows.docx',
+            student_name='Bouke Haarsma',
+            class_code=[
+                {'class_code': 'ECON101', 'class_name': 'Economics 101', 'class_grade': 'A'},
+                {'class_code': 'OPRES', 'class_name': 'Operations Research', 'class_grade': 'A'},
+            ])
+
+    def test_loaded_parts(self):
+        document = MailMerge(path.join(path.dirname(__file__), 'test_passthrough_parts.docx'))
+        document.merge(header_field='two')
+        self.assertEqual(document.get_merge_fields(), {'fieldname'})
+
+        streamed = BytesIO()
+        document.write_merged(streamed, fieldname='one')
+        document.close()
+        with ZipFile(streamed) as output:
+            self.assertIn(b'<w:t>one</w:t>', output.read('word/document.xml'))
+            self.assertIn(b'<w:t>two</w:t>', output.read('word/header1.xml'))
+
+    def test_layout(self):
+        # whitespace, comments and empty elements between the streamed
+        # elements are kept as they are
+        source = path.join(path.dirname(__file__), 'test_merge_table_rows.docx')
+        layout = BytesIO()
+        with ZipFile(source) as docx, ZipFile(layout, 'w', ZIP_DEFLATED) as output:
+            for zi in docx.infolist():
+                data = docx.read(zi)
+                if zi.filename == 'word/document.xml':
+                    data = data.replace(b'<w:body>', b'<w:body>\n  <!-- body & text -->\n  ')
+                    data = data.replace(b'</w:tbl>', b'<w:tr/></w:tbl>\n<?pi data?>\n<w:sdt><w:sdtContent/></w:sdt>')
+                    data = data.replace(b'<w:tr ', b'\n\t<w:tr ')
+                output.writestr(zi, data)
+        self.assert_same_as_merge(layout, student_name='Bouke Haarsma', class_code='ECON101')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+import tempfile
+from os import path
+from zipfile import ZipFile
+
+from mailmerge import MailMerge
+
+SEPARATORS = ('page_break', 'column_break', 'textWrapping_break', 'continuous_section',
+              'evenPage_section', 'nextColumn_section', 'nextPage_section', 'oddPage_section')
+
+
+class WriteTemplatesTest(unittest.TestCase):
+    replacements = [
+        {'fieldname': "xyz"},
+        {'fieldname': "abc"},
+        {},
+        {'fieldname': "2b v ~2b"},
+    ]
+
+    def read_document(self, outfile):
+        with ZipFile(outfile) as output:
+            return output.read('word/document.xml')
+
+    def assert_same_as_merge_templates(self, filename, separator):
+        docx = path.join(path.dirname(__file__), filename)
+
+        with MailMerge(docx) as document, tempfile.TemporaryFile() as outfile:
+            document.merge_templates(self.replacements, separator)
+            document.write(outfile)
+            expected = self.read_document(outfile)
+
+        with MailMerge(docx) as document, tempfile.TemporaryFile() as outfile:
+            document.write_templates(outfile, iter(self.replacements), separator)
+            self.assertEqual(expected, self.read_document(outfile))
+            # the document itself is not merged
+            self.assertEqual(document.get_merge_fields(), {'fieldname'})
+
+    def test_separators(self):
+        for separator in SEPARATORS:
+            self.assert_same_as_merge_templates('test_merge_templates_simple.docx', separator)
+
+    def test_multiple_pages(self):
+        self.assert_same_as_merge_templates('test_merge_pages_paged.docx', 'page_break')
+        self.assert_same_as_merge_templates('test_merge_pages_paged.docx', 'nextPage_section')
+
+    def test_generator(self):
+        docx = path.join(path.dirname(__file__), 'test_merge_templates_simple.docx')
+        with MailMerge(docx) as document, tempfile.TemporaryFile() as outfile:
+            document.write_templates(outfile, ({'fieldname': str(i)} for i in range(100)), 'page_break')
+            xml = self.read_document(outfile)
+
+        self.assertIn(b'<w:t>0</w:t>', xml)
+        self.assertIn(b'<w:t>99</w:t>', xml)
+        self.assertEqual(xml.count(b'<w:sectPr'), 1)
+
+    def assert_same_with_workers(self, filename, separator, replacements, remove_empty_tables=False):
+        docx = path.join(path.dirname(__file__), filename)
+        with MailMerge(docx, remove_empty_tables) as document, tempfile.TemporaryFile() as outfile:
+            document.write_templates(outfile, replacements, separator)
+            expected = self.read_document(outfile)
+
+        with MailMerge(docx, remove_empty_tables) as document, tempfile.TemporaryFile() as outfile:
+            document.write_templates(outfile, iter(replacements), separator, workers=2, chunksize=3)
+            self.assertEqual(expected, self.read_document(outfile))
+
+    def test_workers(self):
+        replacements = [{'fieldname': str(i)} for i in range(10)]
+        for separator in ('page_break', 'nextPage_section'):
+            self.assert_same_with_workers('test_merge_templates_simple.docx', separator, replacements)
+        self.assert_same_with_workers('test_merge_pages_paged.docx', 'continuous_section', replacements)
+
+    def test_workers_nested_fields(self):
+        # the converted fields are passed on to the workers as they are
+        replacements = [{'first_name': 'Name %d' % i, 'gender': 'fm'[i % 2]} for i in range(5)]
+        self.assert_same_with_workers('test_nested_fields.docx', 'page_break', replacements)
+
+    def test_rows(self):
+        # rows are merged into every copy, the document itself is left alone
+        replacements = [
+            {'student_name': 'One', 'class_code': [{'class_code': 'Row0'}, {'class_code': 'Row1'}]},
+            {'student_name': 'Two', 'class_code': [{'class_code': 'Row0'}]},
+            {'student_name': 'Three', 'class_code': []},
+        ]
+        docx = path.join(path.dirname(__file__), 'test_merge_table_rows.docx')
+        with MailMerge(docx) as document, tempfile.TemporaryFile() as outfile:
+            document.merge_templates(replacements, 'page_break')
+            document.write(outfile)
+            expected = self.read_document(outfile)
+        self.assertEqual(expected.count(b'<w:t>Row0</w:t>'), 2)
+        self.assertEqual(expected.count(b'<w:t>Row1</w:t>'), 1)
+
+        for workers in (None, 2):
+            with MailMerge(docx) as document, tempfile.TemporaryFile() as outfile:
+                fields = document.get_merge_fields()
+                document.write_templates(outfile, iter(replacements), 'page_break', workers=workers, chunksize=1)
+                self.assertEqual(expected, self.read_document(outfile))
+                self.assertEqual(document.get_merge_fields(), fields)
+
+    def test_remove_empty_tables(self):
+        replacements = [{'class_code': [{'class_code': 'Row0'}]}, {'class_code': []}]
+        self.assert_same_with_workers('test_merge_table_rows.docx', 'page_break', replacements,
+                                      remove_empty_tables=True)
+
+    def test_invalid_separator(self):
+        docx = path.join(path.dirname(__file__), 'test_merge_templates_simple.docx')
+        with MailMerge(docx) as document, tempfile.TemporaryFile() as outfile:
+            with self.assertRaises(ValueError):
+                document.write_templates(outfile, self.replacements, 'foo_break')
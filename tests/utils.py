@@ -1,3 +1,7 @@
+from io import BytesIO
+from zipfile import ZipFile
+
+
 class EtreeMixin(object):
     def assert_equal_tree(self, lhs, rhs):
         """
@@ -17,3 +21,14 @@ def get_document_body_part(document):
             return part
 
     raise AssertionError("main document body not found in document.parts")
+
+
+def document_xml(docx):
+    """
+    Returns the main document part of a docx, given as bytes, a file name
+    or a file.
+    """
+    if isinstance(docx, bytes):
+        docx = BytesIO(docx)
+    with ZipFile(docx) as package:
+        return package.read('word/document.xml')